@@ -4,7 +4,7 @@ from pathlib import Path
 import pandas as pd
 from datetime import datetime
 from loguru import logger
-import pytz
+from zoneinfo import ZoneInfo
 import numpy as np
 from textblob import TextBlob
 from wa_analyzer.humanhasher import humanize
@@ -91,7 +91,7 @@ def add_living_in_city(df: pd.DataFrame) -> pd.DataFrame:
         "Thies Jan Weijmans", 
         "Smeerbeer van Dijk"
     ]
-    df["living_in_city"] = np.where(df["author"].isin(city_authors), 1, 0)
+    df["living_in_city"] = df["author"].isin(city_authors).to_numpy(dtype=np.uint8)
     return df
 
 def technical_background(df: pd.DataFrame) -> pd.DataFrame:
@@ -102,7 +102,7 @@ def technical_background(df: pd.DataFrame) -> pd.DataFrame:
         "Schjöpschen", 
         "Smeerbeer van Dijk"
     ]
-    df["tech_background"] = np.where(df["author"].isin(tech_background), 1, 0)
+    df["tech_background"] = df["author"].isin(tech_background).to_numpy(dtype=np.uint8)
     return df
 
 def add_word_count(df: pd.DataFrame) -> pd.DataFrame:
@@ -125,17 +125,17 @@ def add_time_differences(df: pd.DataFrame) -> pd.DataFrame:
 
 def flag_image_messages(df: pd.DataFrame) -> pd.DataFrame:
     """Flags messages that represent an image."""
-    df['is_image'] = np.where(df['message'].str.contains('<Media weggelaten>', case=False, na=False), 1, 0)
+    df['is_image'] = df['message'].str.contains('<Media weggelaten>', case=False, na=False).to_numpy(dtype=np.uint8)
     return df
 
 def flag_empty_messages(df: pd.DataFrame) -> pd.DataFrame:
     """Flags messages that contain 'Wachten op dit bericht'."""
-    df['is_empty_message'] = np.where(df['message'].str.contains('Wachten op dit bericht', case=False, na=False), 1, 0)
+    df['is_empty_message'] = df['message'].str.contains('Wachten op dit bericht', case=False, na=False).to_numpy(dtype=np.uint8)
     return df
 
 def flag_removed_messages(df: pd.DataFrame) -> pd.DataFrame:
     """Flags messages that have been removed by the user."""
-    df['is_removed_message'] = np.where(df['message'].str.contains('Je hebt dit bericht verwijderd', case=False, na=False), 1, 0)
+    df['is_removed_message'] = df['message'].str.contains('Je hebt dit bericht verwijderd', case=False, na=False).to_numpy(dtype=np.uint8)
     return df
 
 def main():
@@ -148,7 +148,7 @@ def main():
     df = pd.read_csv(data_path, parse_dates=["timestamp"])
     
     # Clean and transform data
-    df = df.drop(index=[0])
+    df = df.iloc[1:]
     df = clean_author_names(df)
     
     # Add features based on original author names
@@ -169,7 +169,7 @@ def main():
     df = add_sentiment_features(df) # <-- New sentiment analysis feature added here
     
     # Save the cleaned data
-    now = datetime.now(tz=pytz.timezone('Europe/Amsterdam')).strftime("%Y%m%d-%H%M%S")
+    now = datetime.now(tz=ZoneInfo('Europe/Amsterdam')).strftime("%Y%m%d-%H%M%S")
     output_path = processed_path / f"whatsapp-{now}.csv"
     
     df.to_csv(output_path, index=False)
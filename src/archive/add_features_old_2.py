@@ -36,7 +36,7 @@ class FeatureEngineer:
         df['hour'] = df['timestamp'].dt.hour
         df['minute'] = df['timestamp'].dt.minute
         df['day_of_week'] = df['timestamp'].dt.day_name()
-        df['is_weekend'] = np.where(df['day_of_week'].isin(['Saturday', 'Sunday']), 1, 0)
+        df['is_weekend'] = df['day_of_week'].isin(['Saturday', 'Sunday']).to_numpy(dtype=np.uint8)
         return df
         
     def _get_sentiment_polarity(self, text: Union[str, float]) -> float:
@@ -86,10 +86,9 @@ class FeatureEngineer:
             flags=re.UNICODE,
         )
 
-        def has_emoji(text):
-            return bool(emoji_pattern.search(str(text)))
-
-        df["has_emoji"] = df["message"].apply(has_emoji).astype(int)
+        df["has_emoji"] = df["message"].astype("string[pyarrow]").str.contains(
+            emoji_pattern.pattern, regex=True, na=False
+        ).to_numpy(dtype=bool).view(np.int8)
         return df
 
     def _count_emojis(self, df: pd.DataFrame) -> pd.DataFrame:
@@ -164,34 +163,23 @@ class FeatureEngineer:
         df.drop(columns=["time_diff"], inplace=True)
         return df
 
-    def _flag_image_messages(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Flags messages that represent an image."""
-        logger.info("    -> Adding 'is_image' flag.")
-        df['is_image'] = np.where(
-            df['message'].str.contains('<Media weggelaten>', case=False, na=False), 
-            1, 
-            0
-        )
-        return df
-
-    def _flag_empty_messages(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Flags messages that contain 'Wachten op dit bericht'."""
-        logger.info("    -> Adding 'is_empty_message' flag.")
-        df['is_empty_message'] = np.where(
-            df['message'].str.contains('Wachten op dit bericht', case=False, na=False), 
-            1, 
-            0
-        )
-        return df
-
-    def _flag_removed_messages(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Flags messages that have been removed by the user."""
-        logger.info("    -> Adding 'is_removed_message' flag.")
-        df['is_removed_message'] = np.where(
-            df['message'].str.contains('Je hebt dit bericht verwijderd', case=False, na=False), 
-            1, 
-            0
-        )
+    def _flag_special_messages(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Flags messages that represent an image, contain 'Wachten op dit bericht'
+        or have been removed by the user. The message column is converted to an
+        Arrow-backed string once and shared by the three checks.
+        """
+        logger.info("    -> Adding 'is_image', 'is_empty_message' and 'is_removed_message' flags.")
+        messages = df['message'].astype("string[pyarrow]")
+        flag_phrases = {
+            'is_image': '<Media weggelaten>',
+            'is_empty_message': 'Wachten op dit bericht',
+            'is_removed_message': 'Je hebt dit bericht verwijderd',
+        }
+        for column, phrase in flag_phrases.items():
+            df[column] = messages.str.contains(
+                phrase, case=False, regex=False, na=False
+            ).to_numpy(dtype=bool).view(np.int8)
         return df
 
 
@@ -224,9 +212,7 @@ class FeatureEngineer:
         self.df = self._add_time_differences(self.df)
         self.df = self._is_question(self.df)
         self.df = self._meet_up_feature(self.df)
-        self.df = self._flag_image_messages(self.df)
-        self.df = self._flag_empty_messages(self.df)
-        self.df = self._flag_removed_messages(self.df)
+        self.df = self._flag_special_messages(self.df)
         self.df = self._find_emojis(self.df)
         self.df = self._count_emojis(self.df)
         self.df = self._add_sentiment_features(self.df) 
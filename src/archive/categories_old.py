@@ -17,16 +17,17 @@ script_path = Path(__file__).resolve()
 # This assumes the script is in 'DAV/src' and the project root is 'DAV'
 project_root = script_path.parent.parent.parent
 
-# Load config 
-configfile = project_root / "config.toml"
-with configfile.open("rb") as f:
-    config = tomllib.load(f)
+if __name__ == "__main__":
+    # Load config 
+    configfile = project_root / "config.toml"
+    with configfile.open("rb") as f:
+        config = tomllib.load(f)
 
-# Load data
-datafile = (project_root / Path(config["processed"]) / config["current"]).resolve()
-if not datafile.exists():
-    logger.warning(
-        "Datafile does not exist. First run src/preprocess.py, and check the timestamp!"
-    )
-df = pd.read_parquet(datafile)
-df.head()
\ No newline at end of file
+    # Load data
+    datafile = (project_root / Path(config["processed"]) / config["current"]).resolve()
+    if not datafile.exists():
+        logger.warning(
+            "Datafile does not exist. First run src/preprocess.py, and check the timestamp!"
+        )
+    df = pd.read_parquet(datafile)
+    df.head()
\ No newline at end of file
@@ -1,15 +1,35 @@
 # import packages
 import json
-import re
 from pathlib import Path
 import pandas as pd
 import numpy as np 
 from datetime import datetime
 from loguru import logger
-import pytz
 
 from wa_analyzer.humanhasher import humanize 
 
+# Authors per binary author feature, built once at import
+_CITY_AUTHORS = frozenset({
+    "Bas hooge Venterink", 
+    "Robert te Vaarwerk", 
+    "Spiderman Spin", 
+    "Thies Jan Weijmans", 
+    "Smeerbeer van Dijk",
+})
+_TECH_AUTHORS = frozenset({
+    "Weda", 
+    "Robert te Vaarwerk", 
+    "Schjöpschen", 
+    "Smeerbeer van Dijk",
+})
+_PARTNER_AUTHORS = frozenset({
+    "Bas hooge Venterink", 
+    "Thies Jan Weijmans",
+    "Smeerbeer van Dijk",
+    "Thomas Grundel",
+    "Jop van der Woning",
+})
+
 class DataCleaner:
     """
     A class to handle core data cleaning and feature engineering steps on a DataFrame.
@@ -30,8 +50,7 @@ class DataCleaner:
         
     def _clean_author_names(self, df: pd.DataFrame) -> pd.DataFrame:
         """Cleans author names by removing leading tilde characters."""
-        clean_tilde = r"^~\u202f"
-        df.loc[:, "author"] = df["author"].apply(lambda x: re.sub(clean_tilde, "", x))
+        df["author"] = df["author"].str.removeprefix("~\u202f")
         return df
 
     # The following two columns are added based on the name of the author in a unique dataset of the maker of the project. 
@@ -40,61 +59,34 @@ class DataCleaner:
     def _add_living_in_city(self, df: pd.DataFrame) -> pd.DataFrame:
         """Adds a binary column indicating if the author is living in a city."""
         logger.info("    -> Adding 'living_in_city' feature.")
-        city_authors = [
-            "Bas hooge Venterink", 
-            "Robert te Vaarwerk", 
-            "Spiderman Spin", 
-            "Thies Jan Weijmans", 
-            "Smeerbeer van Dijk"
-        ]
-        df.loc[:, "living_in_city"] = np.where(df["author"].isin(city_authors), 1, 0)
+        df["living_in_city"] = df["author"].isin(_CITY_AUTHORS).to_numpy().view(np.int8)
         return df
 
     def _technical_background(self, df: pd.DataFrame) -> pd.DataFrame:
         """Adds a binary column indicating if the author had a technical background in terms of studying."""
         logger.info("    -> Adding 'tech_background' feature.")
-        tech_background = [
-            "Weda", 
-            "Robert te Vaarwerk", 
-            "Schjöpschen", 
-            "Smeerbeer van Dijk"
-        ]
-        df.loc[:, "tech_background"] = np.where(df["author"].isin(tech_background), 1, 0)
+        df["tech_background"] = df["author"].isin(_TECH_AUTHORS).to_numpy().view(np.int8)
         return df
     
     def _living_with_partner(self, df: pd.DataFrame) -> pd.DataFrame:
         """Adds a binary column indicating if the author is living with a partner."""
         logger.info("    -> Adding 'living_with_partner' feature.")
-        partner_authors = [
-            "Bas hooge Venterink", 
-            "Thies Jan Weijmans",
-            "Smeerbeer van Dijk",
-            "Thomas Grundel",
-            "Jop van der Woning"
-        ]
-
-        df.loc[:, "living_with_partner"] = np.where(df["author"].isin(partner_authors), 1, 0)
+        df["living_with_partner"] = df["author"].isin(_PARTNER_AUTHORS).to_numpy().view(np.int8)
         return df
     
     def _date_living_with_partner(self, df: pd.DataFrame) -> pd.DataFrame:
         """Adds a datetime column indicating since when the author is living with a partner."""
         logger.info("    -> Adding 'date_living_with_partner' feature.")
+        # Parsed once as UTC timestamps; authors without a date map to NaT
         partner_dates = {
-            "Bas hooge Venterink": "2024-12-01",
-            "Thies Jan Weijmans": "2024-09-01",
-            "Smeerbeer van Dijk": "2023-06-01",
-            "Thomas Grundel": "2024-11-01",
-            "Jop van der Woning": "2025-03-10"
+            "Bas hooge Venterink": pd.Timestamp("2024-12-01", tz="UTC"),
+            "Thies Jan Weijmans": pd.Timestamp("2024-09-01", tz="UTC"),
+            "Smeerbeer van Dijk": pd.Timestamp("2023-06-01", tz="UTC"),
+            "Thomas Grundel": pd.Timestamp("2024-11-01", tz="UTC"),
+            "Jop van der Woning": pd.Timestamp("2025-03-10", tz="UTC"),
         }
 
-        def get_date(author):
-            date_str = partner_dates.get(author, None)
-            if date_str:
-                return pd.to_datetime(date_str).tz_localize(pytz.UTC)
-            else:
-                return pd.NaT
-
-        df.loc[:, "date_living_with_partner"] = df["author"].apply(get_date)
+        df["date_living_with_partner"] = df["author"].map(partner_dates).astype("datetime64[ns, UTC]")
         return df
 
     def _anonymize_authors(self, df: pd.DataFrame) -> pd.DataFrame:
@@ -115,9 +107,12 @@ class DataCleaner:
             logger.error("Author count mismatch during anonymization.")
             raise ValueError("Some authors were lost during anonymization.")
             
-        df.loc[:, "anon_author"] = df["author"].map(anon)
+        # Rename the categories once instead of probing the dict for every row;
+        # 'author' stays the last column
+        cat = df["author"].astype("category")
+        new_cats = [anon[c] for c in cat.cat.categories]
         df = df.drop(columns=["author"])
-        df.rename(columns={"anon_author": "author"}, inplace=True)
+        df["author"] = cat.cat.rename_categories(new_cats)
         return df
 
     def _save_dataframe(self, df: pd.DataFrame, filename_base: str) -> Path:
@@ -158,15 +153,13 @@ class DataCleaner:
         logger.info(f"Loading data from: {self.input_path.name}")
         
         try:
-            # Load data, assuming timestamp is already a clean datetime column
-            self.df = pd.read_csv(self.input_path, parse_dates=["timestamp"])
+            # Load data, assuming timestamp is already a clean datetime column.
+            # The first data row is skipped while parsing, as per original logic.
+            self.df = pd.read_csv(self.input_path, parse_dates=["timestamp"], skiprows=[1])
         except Exception as e:
             logger.error(f"Failed to load data from {self.input_path}: {e}")
             raise
         
-        # Drop the first row and reset index as per original logic
-        self.df = self.df.drop(index=[0]).reset_index(drop=True)
-        
         logger.info("Starting cleaning and feature engineering steps...")
         
         # 1. Clean author names (Prerequisite for features)
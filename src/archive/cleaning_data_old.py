@@ -3,7 +3,6 @@ import json
 import pandas as pd
 import numpy as np
 from datetime import datetime
-import pytz
 from loguru import logger
 from wa_analyzer.humanhasher import humanize
 from pathlib import Path
@@ -27,15 +26,15 @@ class WADataCleaner:
 
     def filter_data(self) -> 'WADataCleaner':
         """Filters out 'Unknown' authors and 'Wachten op dit bericht' messages."""
-        self.df = self.df[self.df['author'] != 'Unknown']
-        self.df = self.df[~self.df['message'].str.contains('Wachten op dit bericht', na=False)]
+        # One combined mask, so the frame is copied once instead of once per filter
+        keep = (self.df['author'] != 'Unknown') & ~self.df['message'].str.contains('Wachten op dit bericht', na=False)
+        self.df = self.df[keep]
         logger.info("Filtered out 'Unknown' authors and waiting messages.")
         return self
 
     def clean_author_names(self) -> 'WADataCleaner':
         """Cleans author names by removing tilde characters."""
-        clean_tilde = r"^~\u202f"
-        self.df['author'] = self.df['author'].apply(lambda x: re.sub(clean_tilde, "", x))
+        self.df['author'] = self.df['author'].str.replace(r"^~\u202f", "", regex=True)
         logger.info("Cleaned tilde from author names.")
         return self
 
@@ -45,7 +44,7 @@ class WADataCleaner:
             'Bas hooge Venterink', 'Robert te Vaarwerk', 
             'Spiderman Spin', 'Thies Jan Weijmans', 'Smeerbeer van Dijk'
         ]
-        self.df['living_in_city'] = np.where(self.df['author'].isin(city_authors), 1, 0)
+        self.df['living_in_city'] = self.df['author'].isin(city_authors).to_numpy(dtype=np.uint8)
         logger.info("Added 'living_in_city' label.")
         return self
 
@@ -63,9 +62,12 @@ class WADataCleaner:
             ref_sorted = {k: ref[k] for k in sorted(ref.keys())}
             json.dump(ref_sorted, f, indent=4)
         
-        self.df["anon_author"] = self.df.author.map(anon)
+        # Rename the categories once instead of probing the dict for every row;
+        # 'author' stays the last column
+        cat = self.df["author"].astype("category")
+        new_cats = [anon[c] for c in cat.cat.categories]
         self.df.drop(columns=["author"], inplace=True)
-        self.df.rename(columns={"anon_author": "author"}, inplace=True)
+        self.df["author"] = cat.cat.rename_categories(new_cats)
         logger.info(f"Anonymized authors and saved reference file to {reference_file}.")
         return self
 
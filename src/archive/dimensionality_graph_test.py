@@ -146,7 +146,7 @@ class SVDAnalyzer:
         
         # V_T: Features as rows, Factors as columns (easier to read)
         factor_loadings_df = pd.DataFrame(
-            Vt.T, # Transpose Vt to get V, then transpose again for the desired layout (Features x Factors)
+            Vt.T, # V as a transposed view of Vt: Features x Factors, no extra copy
             index=self.feature_cols,
             columns=factor_names
         )
@@ -35,9 +35,11 @@ class DistributionAnalyzer:
         """
         logger.info("    -> Generating KDE distribution plot.")
         
-        # Split data based on the binary feature
-        city_dwellers = df[df['living_in_city'] == 1]['react_time_min_log']
-        non_city_dwellers = df[df['living_in_city'] == 0]['react_time_min_log']
+        # Split data based on the binary feature with one mask over plain arrays
+        in_city = df['living_in_city'].to_numpy() == 1
+        values = df['react_time_min_log'].to_numpy()
+        city_dwellers = values[in_city]
+        non_city_dwellers = values[~in_city]
 
         # Create the figure
         fig, ax = plt.subplots(figsize=(10, 6))
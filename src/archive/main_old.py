@@ -3,7 +3,6 @@ from loguru import logger
 import tomllib
 from pathlib import Path
 from datetime import datetime
-import pytz
 
 # Import the DataCleaner class from your cleaning module
 from cleaning_data import WADataCleaner
@@ -52,13 +51,20 @@ if __name__ == "__main__":
     OUTPUT_DIR = Path("./output_data")
     
     # Clean up previous output directory (optional, for fresh runs)
+    # Renaming is atomic and instant; the old tree is then deleted in a background
+    # thread while the pipeline already writes to a fresh OUTPUT_DIR
     if OUTPUT_DIR.exists():
         logger.info(f"Removing old output directory: {OUTPUT_DIR}")
+        import os
         import shutil
+        import threading
         try:
-            shutil.rmtree(OUTPUT_DIR)
+            old_dir = OUTPUT_DIR.with_name(f"{OUTPUT_DIR.name}.old.{os.getpid()}")
+            OUTPUT_DIR.rename(old_dir)
+            threading.Thread(target=shutil.rmtree, args=(old_dir,), kwargs={"ignore_errors": True}).start()
         except OSError as e:
             logger.error(f"Error removing directory: {e}")
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
     # 2. Prepare the input data
     raw_df = create_dummy_data()
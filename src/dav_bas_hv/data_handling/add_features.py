@@ -1,29 +1,74 @@
 # add_features.py
 
 # import packages
-import re
 import sys
-import tomllib
 from pathlib import Path
 import pandas as pd
 import numpy as np 
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pcsv
+import pyarrow.parquet as pq
 from loguru import logger
-from textblob import TextBlob
-from typing import Union
+from functools import lru_cache
 from datetime import datetime
 import click
 import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 # Import from settings - assuming these are defined elsewhere or copied here for completeness
 # For this script to work, you need 'Folders' and 'CleanConfig' from your settings
 # Assuming 'Folders' and 'CleanConfig' are available, e.g., from 'wa_analyzer.settings'
-from .settings import Folders, CleanConfig 
+from .settings import Folders, CleanConfig, find_latest_file, load_toml_config, read_parquet, read_csv 
 
 # Configure Loguru (copied from clean_data.py)
 logger.remove()
-logger.add("logs/logfile.log", rotation="1 week", level="DEBUG")
+logger.add("logs/logfile.log", rotation="1 week", level="DEBUG", enqueue=True, backtrace=False, diagnose=False)
 logger.add(sys.stderr, level="INFO")
 
+# Sentiment labels from most negative to most positive
+SENTIMENT_CATEGORIES = pd.CategoricalDtype(["Negative", "Neutral", "Positive"], ordered=True)
+
+# Below this many messages the feature steps run in a single process
+PARALLEL_MIN_ROWS = 200_000
+
+# Emoji ranges, written so both Python's re and pyarrow's RE2 engine accept them
+_EMOJI_PATTERN = (
+    "["
+    "\U0001f600-\U0001f64f"
+    "\U0001f300-\U0001f5ff"
+    "\U0001f680-\U0001f6ff"
+    "\U0001f1e0-\U0001f1ff"
+    "\U00002702-\U000027b0"
+    "\U000024c2-\U0001f251"
+    "]+"
+)
+
+# A run of characters that str.split() does not treat as whitespace. RE2's \s is
+# ASCII-only (and lacks \v), so the remaining Unicode whitespace is listed explicitly.
+_WORD_PATTERN = r"[^\s\x{0b}\x{1c}-\x{1f}\x{85}\p{Z}]+"
+
+# Flag column -> phrase WhatsApp uses for that kind of system message
+_FLAG_PHRASES = {
+    "is_image": "<Media weggelaten>",
+    "is_empty_message": "Wachten op dit bericht",
+    "is_removed_message": "Je hebt dit bericht verwijderd",
+}
+
+def _to_arrow_strings(series: pd.Series) -> pa.Array:
+    """Converts a text column to a pyarrow string array for pyarrow.compute kernels."""
+    return pa.array(series, type=pa.string(), from_pandas=True)
+
+@lru_cache(maxsize=1)
+def _load_sentiment_lexicon() -> dict[str, float]:
+    """Loads the TextBlob (pattern) English lexicon once as a word -> polarity dict."""
+    # Imported here so importing this module stays cheap when sentiment is not needed
+    from textblob.en import sentiment as pattern_sentiment
+
+    pattern_sentiment.load()
+    # The None key holds the polarity averaged over all part-of-speech tags
+    return {word: scores[None][0] for word, scores in dict.items(pattern_sentiment)}
+
 # --- FeatureEngineer Class ---
 class FeatureEngineer:
     """
@@ -36,6 +81,8 @@ class FeatureEngineer:
         :param config: The loaded configuration object including Folders.
         """
         self.folders = config.folders
+        self.write_csv = config.write_csv
+        self.sentiment_backend = config.sentiment_backend
         self.df = None
         
         # **CHANGE 2: Use self.folders.feature_added for the output directory**
@@ -53,19 +100,43 @@ class FeatureEngineer:
         df['hour'] = df['timestamp'].dt.hour
         df['minute'] = df['timestamp'].dt.minute
         df['day_of_week'] = df['timestamp'].dt.day_name()
-        df['is_weekend'] = np.where(df['day_of_week'].isin(['Saturday', 'Sunday']), 1, 0)
+        df['is_weekend'] = df['day_of_week'].isin(['Saturday', 'Sunday']).to_numpy().view(np.int8)
         return df
         
-    def _get_sentiment_polarity(self, text: Union[str, float]) -> float:
+    def _get_sentiment_polarity(self, messages: pd.Series) -> pd.Series:
+        """
+        Calculates the sentiment polarity (-1.0 to 1.0) of every message in one pass.
+        Each message scores the mean polarity of its words found in the TextBlob
+        (pattern) lexicon. Returns 0.0 (Neutral) for missing values or messages
+        without any known words.
         """
-        Calculates the sentiment polarity (-1.0 to 1.0) of a given text.
-        Returns 0.0 (Neutral) for missing or non-string values.
+        # Tokenize all messages at once and flatten to one word per row
+        tokens = messages.astype("string").str.lower().str.findall(r"\b\w+\b").explode()
+        # Words outside the lexicon map to NaN and are ignored by mean()
+        word_polarity = tokens.map(_load_sentiment_lexicon())
+        polarity = word_polarity.groupby(level=0).mean()
+        return polarity.reindex(messages.index).fillna(0.0).astype(float)
+
+    def _get_vader_polarity(self, messages: pd.Series) -> pd.Series:
         """
-        if pd.isna(text):
-            return 0.0 
-        # TextBlob analysis
-        analysis = TextBlob(str(text))
-        return analysis.sentiment.polarity
+        Calculates the VADER compound score (-1.0 to 1.0) of every message.
+        VADER is tuned for short social-media text including emoji. Requires the
+        optional 'vaderSentiment' package; missing messages score 0.0 (Neutral).
+        """
+        try:
+            from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+        except ImportError as e:
+            logger.error("sentiment_backend = 'vader' requires the 'vaderSentiment' package.")
+            raise ImportError("Install 'vaderSentiment' to use the VADER sentiment backend.") from e
+
+        sia = SentimentIntensityAnalyzer()
+        texts = messages.fillna("").astype(str)
+        scores = np.fromiter(
+            (sia.polarity_scores(text)["compound"] for text in texts),
+            dtype=np.float64,
+            count=len(texts),
+        )
+        return pd.Series(scores, index=messages.index)
 
     def _add_sentiment_features(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -74,66 +145,30 @@ class FeatureEngineer:
         """
         logger.info("    -> Adding sentiment features.")
         # 1. Add numerical polarity score
-        df['sentiment_polarity'] = df['message'].apply(self._get_sentiment_polarity)
+        if self.sentiment_backend == "vader":
+            df['sentiment_polarity'] = self._get_vader_polarity(df['message'])
+        else:
+            df['sentiment_polarity'] = self._get_sentiment_polarity(df['message'])
         
         # 2. Add categorical sentiment for high-level analysis (using a small buffer for Neutral)
-        def classify_sentiment(polarity):
-            if polarity > 0.05:
-                return 'Positive'
-            elif polarity < -0.05:
-                return 'Negative'
-            else:
-                return 'Neutral'
-                
-        df['sentiment_category'] = df['sentiment_polarity'].apply(classify_sentiment)
-        return df
-
-    def _find_emojis(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Adds a feature column 'has_emoji' based on message content."""
-        logger.info("    -> Adding 'has_emoji' feature.")
-        emoji_pattern = re.compile(
-            "["
-            "\U0001f600-\U0001f64f"
-            "\U0001f300-\U0001f5ff"
-            "\U0001f680-\U0001f6ff"
-            "\U0001f1e0-\U0001f1ff"
-            "\U00002702-\U000027b0"
-            "\U000024c2-\U0001f251"
-            "]+",
-            flags=re.UNICODE,
-        )
-
-        def has_emoji(text):
-            return bool(emoji_pattern.search(str(text)))
-
-        df["has_emoji"] = df["message"].apply(has_emoji).astype(int)
+        polarity = df['sentiment_polarity'].to_numpy()
+        codes = np.select([polarity > 0.05, polarity < -0.05], [2, 0], default=1).astype("int8")
+        df['sentiment_category'] = pd.Categorical.from_codes(codes, dtype=SENTIMENT_CATEGORIES)
         return df
 
-    def _count_emojis(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Adds a feature column 'emoji_count' based on message content."""
-        logger.info("    -> Adding 'emoji_count' feature.")
-        emoji_pattern = re.compile(
-            "["
-            "\U0001f600-\U0001f64f"
-            "\U0001f300-\U0001f5ff"
-            "\U0001f680-\U0001f6ff"
-            "\U0001f1e0-\U0001f1ff"
-            "\U00002702-\U000027b0"
-            "\U000024c2-\U0001f251"
-            "]+",
-            flags=re.UNICODE,
-        )
-
-        def get_emoji_count(text):
-            return len(emoji_pattern.findall(str(text)))
-
-        df["emoji_count"] = df["message"].apply(get_emoji_count)
+    def _add_emoji_features(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Adds the feature columns 'emoji_count' and 'has_emoji' in one pass over the messages."""
+        logger.info("    -> Adding 'emoji_count' and 'has_emoji' features.")
+        counts = pc.count_substring_regex(_to_arrow_strings(df["message"]), _EMOJI_PATTERN)
+        emoji_count = counts.fill_null(0).to_numpy(zero_copy_only=False)
+        df["has_emoji"] = (emoji_count > 0).view(np.int8)
+        df["emoji_count"] = emoji_count.astype("int32")
         return df
     
     def _is_question(self, df: pd.DataFrame) -> pd.DataFrame:
         """Adds a feature column 'is_question' indicating if the message is a question."""
         logger.info("    -> Adding 'is_question' feature.")
-        df["is_question"] = df["message"].astype(str).apply(lambda x: '?' in x).astype(int)
+        df["is_question"] = df["message"].astype(str).apply(lambda x: '?' in x).to_numpy(dtype=bool).view(np.int8)
         return df
     
     def _meet_up_feature(self, df: pd.DataFrame) -> pd.DataFrame:
@@ -145,79 +180,97 @@ class FeatureEngineer:
 
         df["mentions_meet_up"] = df["message"].astype(str).str.lower().apply(
             lambda x: any(word in x for word in meet_up_keywords)
-        ).astype(int)
+        ).to_numpy(dtype=bool).view(np.int8)
         return df
 
     def _add_word_count(self, df: pd.DataFrame) -> pd.DataFrame:
         """Calculates the number of words in each message."""
         logger.info("    -> Adding 'word_count' feature.")
-        # Ensure message is string and handle NaN gracefully
-        df["word_count"] = df["message"].astype(str).str.split().str.len()
+        # Count runs of non-whitespace (same as split()) in one pyarrow kernel pass.
+        # WhatsApp caps a message at 65,536 characters, so the count always fits in uint16.
+        counts = pc.count_substring_regex(_to_arrow_strings(df["message"]), _WORD_PATTERN)
+        df["word_count"] = counts.fill_null(0).to_numpy(zero_copy_only=False).astype("uint16")
         return df
 
     def _add_time_differences(self, df: pd.DataFrame) -> pd.DataFrame:
         """
-        Calculates the time difference between consecutive messages in seconds,
-        minutes, and hours. Requires the DataFrame to be sorted by timestamp.
+        Calculates the time difference between consecutive messages in seconds
+        as float32 ('react_time_sec'). Minutes, hours and log transforms are
+        derived by the analyses that need them. Requires the DataFrame to be
+        sorted by timestamp.
         """
-        logger.info("    -> Adding time difference features ('react_time_sec', etc.).")
+        logger.info("    -> Adding time difference feature 'react_time_sec'.")
         
-        # Ensure data is sorted by timestamp and reset index for safe diff
-        df = df.sort_values("timestamp").reset_index(drop=True)
+        # Ensure data is sorted by timestamp and reset index for safe diff.
+        # WhatsApp exports are chronological, so the sort is usually skipped.
+        if not df["timestamp"].is_monotonic_increasing:
+            df = df.sort_values("timestamp", kind="mergesort").reset_index(drop=True)
         
-        df["time_diff"] = df["timestamp"].diff()
-
-        # Seconds, Minutes, Hours
-        df["react_time_sec"] = df["time_diff"].dt.total_seconds()
-        df["react_time_sec_plus_1"] = df["react_time_sec"] + 1 # To avoid division by zero in analyses
-        df["react_time_sec_log"] = np.log(df["react_time_sec_plus_1"]) # Log-transform for skewed distribution
-        df["react_time_min"] = df["react_time_sec"] / 60
-        df["react_time_min_plus_1"] = df["react_time_min"] + 1 # To avoid division by zero in analyses
-        df["react_time_min_log"] = np.log(df["react_time_min_plus_1"]) # Log-transform for skewed distribution                                                                                 
-        df["react_time_hr"] = df["react_time_sec"] / 3600
-        df["react_time_hr_plus_1"] = df["react_time_hr"] + 1 # To avoid division by zero in analyses
-        df["react_time_hr_log"] = np.log(df["react_time_hr_plus_1"]) # Log-transform for skewed distribution
-
-        df.drop(columns=["time_diff"], inplace=True)
-        return df
+        # Gap to the previous message in seconds, computed once on the raw nanosecond buffer.
+        # The first message has no predecessor and stays NaN.
+        ts_ns = df["timestamp"].to_numpy(dtype="datetime64[ns]").view("int64")
+        seconds = np.full(len(df), np.nan, dtype=np.float32)
+        seconds[1:] = np.diff(ts_ns) / 1e9
+        df["react_time_sec"] = seconds
 
-    def _flag_image_messages(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Flags messages that represent an image."""
-        logger.info("    -> Adding 'is_image' flag.")
-        df['is_image'] = np.where(
-            df['message'].str.contains('<Media weggelaten>', case=False, na=False), 
-            1, 
-            0
-        )
         return df
 
-    def _flag_empty_messages(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Flags messages that contain 'Wachten op dit bericht'."""
-        logger.info("    -> Adding 'is_empty_message' flag.")
-        df['is_empty_message'] = np.where(
-            df['message'].str.contains('Wachten op dit bericht', case=False, na=False), 
-            1, 
-            0
-        )
+    def _flag_special_messages(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Flags messages that represent an image, are still waiting to be received
+        ('Wachten op dit bericht') or have been removed by the user, using
+        pyarrow's case-insensitive substring kernel.
+        """
+        logger.info("    -> Adding 'is_image', 'is_empty_message' and 'is_removed_message' flags.")
+        messages = _to_arrow_strings(df['message'])
+        for column, phrase in _FLAG_PHRASES.items():
+            matches = pc.match_substring(messages, phrase, ignore_case=True)
+            # Reinterpret the 1-byte booleans as int8 instead of copying them
+            df[column] = matches.fill_null(False).to_numpy(zero_copy_only=False).view(np.int8)
         return df
 
-    def _flag_removed_messages(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Flags messages that have been removed by the user."""
-        logger.info("    -> Adding 'is_removed_message' flag.")
-        df['is_removed_message'] = np.where(
-            df['message'].str.contains('Je hebt dit bericht verwijderd', case=False, na=False), 
-            1, 
-            0
-        )
+    def _add_message_features(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Applies all steps that only look at a single message to the DataFrame."""
+        df = self._add_timestamp_features(df)
+        df = self._add_word_count(df)
+        df = self._is_question(df)
+        df = self._meet_up_feature(df)
+        df = self._flag_special_messages(df)
+        df = self._add_emoji_features(df)
+        df = self._add_sentiment_features(df)
         return df
 
+    def _add_message_features_parallel(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Applies the message-based steps on row partitions in worker processes.
+        Small chats are processed in this process, where starting workers
+        would cost more than it saves.
+        """
+        n_workers = os.cpu_count() or 1
+        if n_workers == 1 or len(df) < PARALLEL_MIN_ROWS:
+            return self._add_message_features(df)
+
+        logger.info(f"    -> Adding message features on {n_workers} partitions.")
+        bounds = np.array_split(np.arange(len(df)), n_workers)
+        chunks = [df.iloc[idx[0]:idx[-1] + 1] for idx in bounds if len(idx) > 0]
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            results = list(executor.map(self._add_message_features, chunks))
+        return pd.concat(results)
+
+    def __getstate__(self) -> dict:
+        # Worker processes only need the configuration, not the loaded data
+        state = self.__dict__.copy()
+        state["df"] = None
+        return state
+
     def _save_dataframe(self, df: pd.DataFrame, filename_base: str) -> Path:
         """
-        Saves the DataFrame to CSV and Parquet with a timestamped filename.
+        Saves the DataFrame to Parquet with a timestamped filename, and to CSV
+        as well when 'write_csv' is enabled in the config.
 
         :param df: The pandas DataFrame to save.
         :param filename_base: The base name for the file (e.g., "whatsapp-features").
-        :return: Path to the final feature-engineered CSV file.
+        :return: Path to the final feature-engineered Parquet file.
         """
         # Generate the timestamp
         now = datetime.now().strftime("%Y%m%d-%H%M%S")
@@ -227,15 +280,38 @@ class FeatureEngineer:
         outfile_csv = self.folders.feature_added / f"{filename_base}-{now}-features.csv"
         outfile_parquet = self.folders.feature_added / f"{filename_base}-{now}-features.parq"
         
-        logger.info(f"Writing CSV to {outfile_csv}")
-        df.to_csv(outfile_csv, index=False)
+        # Convert to Arrow once and write both files from the same table
+        table = pa.Table.from_pandas(df, preserve_index=False)
         
-        logger.info(f"Writing Parquet to {outfile_parquet}")
-        df.to_parquet(outfile_parquet, index=False)
+        # pyarrow's writers release the GIL, so the optional CSV is written on a
+        # second thread while the Parquet file is written here
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            csv_write = None
+            if self.write_csv:
+                # pyarrow's CSV writer is several times faster than DataFrame.to_csv
+                logger.info(f"Writing CSV to {outfile_csv}")
+                csv_write = executor.submit(pcsv.write_csv, table, outfile_csv)
+            
+            logger.info(f"Writing Parquet to {outfile_parquet}")
+            # zstd level 3 (pyarrow defaults to 1) for smaller files; dictionary encoding
+            # and column statistics stay on so readers can prune row groups
+            pq.write_table(
+                table, 
+                outfile_parquet, 
+                compression="zstd", 
+                compression_level=3, 
+                row_group_size=64 * 1024, 
+                use_dictionary=True, 
+                write_statistics=True
+            )
+            
+            if csv_write is not None:
+                # Re-raises any error from the CSV write
+                csv_write.result()
         
         logger.success("Saving complete.")
         
-        return outfile_csv
+        return outfile_parquet
 
 
     def run(self) -> Path:
@@ -243,48 +319,48 @@ class FeatureEngineer:
         Runs the feature engineering pipeline: loads cleaned data, adds features, 
         and saves the final output.
         
-        :return: Path to the final feature-engineered CSV file.
+        :return: Path to the final feature-engineered Parquet file.
         """
         # **CHANGE 4: Find the latest file in the 'cleaned' folder**
-        input_files = list(self.folders.cleaned.glob("*-cleaned.csv"))
+        # Find the file with the most recent modification time (mtime), preferring Parquet
+        input_file = (
+            find_latest_file(self.folders.cleaned, "*-cleaned.parq")
+            or find_latest_file(self.folders.cleaned, "*-cleaned.csv")
+        )
         
-        if not input_files:
-            logger.error(f"No *-cleaned.csv files found in {self.folders.cleaned}. Exiting.")
-            raise FileNotFoundError(f"No cleaned CSV files found in {self.folders.cleaned}")
-            
-        # Find the file with the most recent modification time (mtime)
-        input_csv_file = max(input_files, key=os.path.getmtime)
-        input_parquet_file = input_csv_file.with_suffix(".parq")
+        if input_file is None:
+            logger.error(f"No *-cleaned.parq or *-cleaned.csv files found in {self.folders.cleaned}. Exiting.")
+            raise FileNotFoundError(f"No cleaned files found in {self.folders.cleaned}")
         
-        logger.info(f"Selected latest file for feature engineering: {input_csv_file.name}")
+        logger.info(f"Selected latest file for feature engineering: {input_file.name}")
         
         try:
-            # Load data. Check for Parquet first.
-            if input_parquet_file.exists():
-                logger.info(f"Loading data from {input_parquet_file.name}")
-                self.df = pd.read_parquet(input_parquet_file)
+            logger.info(f"Loading data from {input_file.name}")
+            if input_file.suffix == ".parq":
+                self.df = read_parquet(input_file)
             else:
-                logger.info(f"Loading data from {input_csv_file.name}")
-                self.df = pd.read_csv(input_csv_file, parse_dates=["timestamp"])
+                # Both date columns are converted while parsing, as in the Parquet file
+                self.df = read_csv(
+                    input_file,
+                    column_types={
+                        "timestamp": pa.timestamp("ns", tz="UTC"),
+                        "date_living_with_partner": pa.timestamp("ns", tz="UTC"),
+                        "message": pa.string(),
+                        "author": pa.string(),
+                    },
+                )
                 
         except Exception as e:
-            logger.error(f"Failed to load data from {input_csv_file}: {e}")
+            logger.error(f"Failed to load data from {input_file}: {e}")
             raise
         
         logger.info("Starting feature engineering steps...")
         
-        # Apply all message-based feature engineering steps
-        self.df = self._add_timestamp_features(self.df)
-        self.df = self._add_word_count(self.df)
+        # Time differences need the whole (sorted) chat, so they run first
         self.df = self._add_time_differences(self.df)
-        self.df = self._is_question(self.df)
-        self.df = self._meet_up_feature(self.df)
-        self.df = self._flag_image_messages(self.df)
-        self.df = self._flag_empty_messages(self.df)
-        self.df = self._flag_removed_messages(self.df)
-        self.df = self._find_emojis(self.df)
-        self.df = self._count_emojis(self.df)
-        self.df = self._add_sentiment_features(self.df) 
+        
+        # Apply all message-based feature engineering steps
+        self.df = self._add_message_features_parallel(self.df)
         
         logger.info("Feature engineering steps complete.")
         
@@ -296,8 +372,7 @@ class FeatureEngineer:
 # **Helper function to load config (copied from clean_data.py)**
 def _load_config() -> CleanConfig:
     """Loads configuration from config.toml and returns a CleanConfig object."""
-    with open("config.toml", "rb") as f:
-        config = tomllib.load(f)
+    config = load_toml_config()
 
     # Assume 'raw', 'preprocessed', 'cleaned', 'feature_added' are in config.toml
     raw = Path(config["raw"])
@@ -318,15 +393,18 @@ def _load_config() -> CleanConfig:
     # Create the CleanConfig object (assuming it holds the Folders object)
     clean_config = CleanConfig(
         folders=folders,
+        write_csv=config.get("write_csv", False),
+        sentiment_backend=config.get("sentiment_backend", "textblob"),
     )
     return clean_config
 
 # --- NEW PUBLIC FUNCTION (Same pattern as run_cleaning) ---
-def run_feature_engineering() -> Path:
+def run_feature_engineering(write_csv: bool | None = None) -> Path:
     """
     Public entry point for the feature engineering process to be called from other modules.
     
-    :return: Path to the final feature-engineered CSV file.
+    :param write_csv: Also write a CSV copy; None uses 'write_csv' from config.toml.
+    :return: Path to the final feature-engineered Parquet file.
     """
     try:
         config = _load_config()
@@ -335,6 +413,9 @@ def run_feature_engineering() -> Path:
         # Use return instead of sys.exit(1) for cleaner external calls
         raise RuntimeError("Failed to load feature engineering configuration.")
 
+    if write_csv is not None:
+        config.write_csv = write_csv
+
     logger.info(f"Input path assumed from cleaned folder: {config.folders.cleaned}")
     
     # Run the feature engineer
@@ -343,10 +424,13 @@ def run_feature_engineering() -> Path:
     return engineer.run()
 
 @click.command()
-def main():
+@click.option(
+    "--write-csv/--no-write-csv", default=None, help="Also write a CSV copy (default: 'write_csv' in config.toml)"
+)
+def main(write_csv: bool | None):
     """Main entry point for the feature engineering process (CLI use)."""
     # Simply call the new run_feature_engineering function
-    run_feature_engineering()
+    run_feature_engineering(write_csv=write_csv)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,26 +1,59 @@
 # import packages
 import json
-import re
 import sys
-import tomllib
 from pathlib import Path
 import pandas as pd
 import numpy as np 
+import pyarrow as pa
+import pyarrow.csv as pcsv
+import pyarrow.parquet as pq
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from loguru import logger
-import pytz
 import click
-import os
 
 # Import from settings
-from .settings import Folders, CleanConfig # CleanConfig will be defined below
+from .settings import Folders, CleanConfig, find_latest_file, load_toml_config, read_csv # CleanConfig will be defined below
 from wa_analyzer.humanhasher import humanize 
 
 # Configure Loguru (copied from preprocess.py)
 logger.remove()
-logger.add("logs/logfile.log", rotation="1 week", level="DEBUG")
+logger.add("logs/logfile.log", rotation="1 week", level="DEBUG", enqueue=True, backtrace=False, diagnose=False)
 logger.add(sys.stderr, level="INFO")
 
+# Authors per binary author feature, built once at import
+CITY_AUTHORS = frozenset({
+    "Bas hooge Venterink", 
+    "Robert te Vaarwerk", 
+    "Spiderman Spin", 
+    "Thies Jan Weijmans", 
+    "Smeerbeer van Dijk",
+})
+TECH_BACKGROUND_AUTHORS = frozenset({
+    "Weda", 
+    "Robert te Vaarwerk", 
+    "Schjöpschen", 
+    "Smeerbeer van Dijk",
+})
+PARTNER_AUTHORS = frozenset({
+    "Bas hooge Venterink", 
+    "Thies Jan Weijmans",
+    "Smeerbeer van Dijk",
+    "Thomas Grundel",
+    "Jop van der Woning",
+})
+# Author -> date since when they live with their partner
+PARTNER_DATES = {
+    "Bas hooge Venterink": "2024-12-01",
+    "Thies Jan Weijmans": "2024-09-01",
+    "Smeerbeer van Dijk": "2023-06-01",
+    "Thomas Grundel": "2024-11-01",
+    "Jop van der Woning": "2025-03-10",
+}
+
+# Output directories already created in this process
+_CREATED: set[Path] = set()
+
 # --- DataCleaner Class ---
 class DataCleaner:
     """
@@ -31,113 +64,111 @@ class DataCleaner:
         :param config: The loaded configuration object including Folders.
         """
         self.folders = config.folders # Use Folders object
+        self.write_csv = config.write_csv
         self.df = None
+        self._author_cat = None # Categorical view of the author column, built once per run
         
-        # Ensure the directory for the cleaned folder exists (from self.folders)
-        self.folders.cleaned.mkdir(parents=True, exist_ok=True)
-        # We assume the parent of the cleaned folder is the correct place for the
-        # anonymization reference file.
-        self.folders.cleaned.parent.mkdir(parents=True, exist_ok=True) 
+        # Ensure the directory for the cleaned folder exists (from self.folders).
+        # parents=True also creates its parent, where the anonymization reference
+        # file is written.
+        if self.folders.cleaned not in _CREATED:
+            self.folders.cleaned.mkdir(parents=True, exist_ok=True)
+            _CREATED.add(self.folders.cleaned)
 
     # --- Feature Engineering Methods (Unchanged for brevity) ---
     
     def _clean_author_names(self, df: pd.DataFrame) -> pd.DataFrame:
         """Cleans author names by removing leading tilde characters."""
-        clean_tilde = r"^~\u202f"
-        df.loc[:, "author"] = df["author"].apply(lambda x: re.sub(clean_tilde, "", x))
+        df["author"] = df["author"].str.removeprefix("~\u202f")
+        self._author_cat = None
         return df
+
+    def _author_categorical(self, df: pd.DataFrame) -> pd.Categorical:
+        """
+        Returns the author column as a Categorical, built once and shared by all
+        author-based features so each of them is a gather over the category codes.
+        """
+        if self._author_cat is None or len(self._author_cat) != len(df):
+            self._author_cat = pd.Categorical(df["author"])
+        return self._author_cat
+
+    def _author_flag(self, df: pd.DataFrame, authors: frozenset[str]) -> np.ndarray:
+        """
+        Returns an int8 array that is 1 for rows written by one of the given authors,
+        gathered from a small lookup table over the author category codes.
+        """
+        author_cat = self._author_categorical(df)
+        categories = author_cat.categories
+        # One extra slot so missing authors (code -1) index a 0
+        lookup = np.zeros(len(categories) + 1, dtype=np.int8)
+        positions = categories.get_indexer(list(authors))
+        lookup[positions[positions >= 0]] = 1
+        return lookup[author_cat.codes]
     
     def _add_living_in_city(self, df: pd.DataFrame) -> pd.DataFrame:
         """Adds a binary column indicating if the author is living in a city."""
         logger.info("    -> Adding 'living_in_city' feature.")
-        city_authors = [
-            "Bas hooge Venterink", 
-            "Robert te Vaarwerk", 
-            "Spiderman Spin", 
-            "Thies Jan Weijmans", 
-            "Smeerbeer van Dijk"
-        ]
-        df.loc[:, "living_in_city"] = np.where(df["author"].isin(city_authors), 1, 0)
+        df["living_in_city"] = self._author_flag(df, CITY_AUTHORS)
         return df
 
     def _technical_background(self, df: pd.DataFrame) -> pd.DataFrame:
         """Adds a binary column indicating if the author had a technical background in terms of studying."""
         logger.info("    -> Adding 'tech_background' feature.")
-        tech_background = [
-            "Weda", 
-            "Robert te Vaarwerk", 
-            "Schjöpschen", 
-            "Smeerbeer van Dijk"
-        ]
-        df.loc[:, "tech_background"] = np.where(df["author"].isin(tech_background), 1, 0)
+        df["tech_background"] = self._author_flag(df, TECH_BACKGROUND_AUTHORS)
         return df
     
     def _living_with_partner(self, df: pd.DataFrame) -> pd.DataFrame:
         """Adds a binary column indicating if the author is living with a partner."""
         logger.info("    -> Adding 'living_with_partner' feature.")
-        partner_authors = [
-            "Bas hooge Venterink", 
-            "Thies Jan Weijmans",
-            "Smeerbeer van Dijk",
-            "Thomas Grundel",
-            "Jop van der Woning"
-        ]
-
-        df.loc[:, "living_with_partner"] = np.where(df["author"].isin(partner_authors), 1, 0)
+        df["living_with_partner"] = self._author_flag(df, PARTNER_AUTHORS)
         return df
     
     def _date_living_with_partner(self, df: pd.DataFrame) -> pd.DataFrame:
         """Adds a datetime column indicating since when the author is living with a partner."""
         logger.info("    -> Adding 'date_living_with_partner' feature.")
-        partner_dates = {
-            "Bas hooge Venterink": "2024-12-01",
-            "Thies Jan Weijmans": "2024-09-01",
-            "Smeerbeer van Dijk": "2023-06-01",
-            "Thomas Grundel": "2024-11-01",
-            "Jop van der Woning": "2025-03-10"
-        }
-
-        def get_date(author):
-            date_str = partner_dates.get(author, None)
-            if date_str:
-                return pd.to_datetime(date_str).tz_localize(pytz.UTC)
-            else:
-                return pd.NaT
-
-        df.loc[:, "date_living_with_partner"] = df["author"].apply(get_date)
+        # Parse one date per distinct author, then gather by category code;
+        # authors without a partner date (and missing authors, code -1) get NaT
+        author_cat = self._author_categorical(df)
+        per_author = pd.to_datetime(author_cat.categories.map(PARTNER_DATES)).tz_localize("UTC")
+        df["date_living_with_partner"] = per_author.take(
+            author_cat.codes, allow_fill=True, fill_value=pd.NaT
+        )
         return df
     
     def _anonymize_authors(self, df: pd.DataFrame) -> pd.DataFrame:
         """Anonymizes author names and saves a reference file."""
         logger.info("    -> Anonymizing authors.")
-        authors = df.author.unique()
-        anon = {k: humanize(k) for k in authors}
+        # Integer code per row plus one entry per distinct author
+        codes, authors = pd.factorize(df["author"], use_na_sentinel=False)
+        anon_names = np.array([humanize(k) for k in authors], dtype=object)
         
         # **CHANGE 2: Use self.folders.cleaned.parent for the reference file**
         reference_file = self.folders.cleaned.parent / "anon_reference.json"
         
+        # Reference mapping: Anonymized Name -> Original Name, written sorted by anonymized name
+        reference = dict(zip(anon_names, authors))
         with open(reference_file, "w") as f:
-            # Create reference mapping: Anonymized Name -> Original Name
-            ref = {v: k for k, v in anon.items()}
-            ref_sorted = {k: ref[k] for k in sorted(ref.keys())}
-            json.dump(ref_sorted, f, indent=4)
+            json.dump(reference, f, indent=4, sort_keys=True)
         
-        if not len(anon) == len(authors):
+        if not len(reference) == len(authors):
             logger.error("Author count mismatch during anonymization.")
             raise ValueError("Some authors were lost during anonymization.")
             
-        df.loc[:, "anon_author"] = df["author"].map(anon)
-        df = df.drop(columns=["author"])
-        df.rename(columns={"anon_author": "author"}, inplace=True)
+        # Reuse the codes for a categorical column (one name per author, small int
+        # code per row); 'author' stays the last column. The old column is deleted
+        # in place, as drop() would copy the whole frame.
+        del df["author"]
+        df["author"] = pd.Categorical.from_codes(codes, categories=anon_names)
         return df
 
     def _save_dataframe(self, df: pd.DataFrame, filename_base: str) -> Path:
         """
-        Saves the DataFrame to CSV and Parquet with a timestamped filename.
+        Saves the DataFrame to Parquet with a timestamped filename, and to CSV
+        as well when 'write_csv' is enabled in the config.
 
         :param df: The pandas DataFrame to save.
         :param filename_base: The base name for the file (e.g., "whatsapp-cleaned").
-        :return: Path to the final cleaned CSV file.
+        :return: Path to the final cleaned Parquet file.
         """
         # Generate the timestamp
         now = datetime.now().strftime("%Y%m%d-%H%M%S")
@@ -146,43 +177,73 @@ class DataCleaner:
         outfile_csv = self.folders.cleaned / f"{filename_base}-{now}-cleaned.csv"
         outfile_parquet = self.folders.cleaned / f"{filename_base}-{now}-cleaned.parq"
         
-        logger.info(f"Writing CSV to {outfile_csv}")
-        df.to_csv(outfile_csv, index=False)
+        # Convert to Arrow once and write both files from the same table
+        table = pa.Table.from_pandas(df, preserve_index=False)
         
-        logger.info(f"Writing Parquet to {outfile_parquet}")
-        df.to_parquet(outfile_parquet, index=False)
+        # pyarrow's writers release the GIL, so the optional CSV is written on a
+        # second thread while the Parquet file is written here
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            csv_write = None
+            if self.write_csv:
+                # pyarrow's CSV writer is several times faster than DataFrame.to_csv
+                logger.info(f"Writing CSV to {outfile_csv}")
+                csv_write = executor.submit(pcsv.write_csv, table, outfile_csv)
+            
+            logger.info(f"Writing Parquet to {outfile_parquet}")
+            # zstd level 3 (pyarrow defaults to 1) for smaller files; dictionary encoding
+            # and column statistics stay on so readers can prune row groups
+            pq.write_table(
+                table, 
+                outfile_parquet, 
+                compression="zstd", 
+                compression_level=3, 
+                row_group_size=64 * 1024, 
+                use_dictionary=True, 
+                write_statistics=True
+            )
+            
+            if csv_write is not None:
+                # Re-raises any error from the CSV write
+                csv_write.result()
         
         logger.success("Saving complete.")
         
-        return outfile_csv
+        return outfile_parquet
 
     def run(self) -> Path:
         """
         Runs the cleaning pipeline: loads data, cleans authors, adds features, 
         anonymizes, and saves the final output.
         
-        :return: Path to the final cleaned CSV file.
+        :return: Path to the final cleaned Parquet file.
         """
-        input_files = list(self.folders.preprocessed.glob("*-preprocess.csv"))
+        # Find the file with the most recent modification time (mtime)
+        input_file = find_latest_file(self.folders.preprocessed, "*-preprocess.csv")
         
-        if not input_files:
+        if input_file is None:
             logger.error(f"No *-preprocess.csv files found in {self.folders.preprocessed}. Exiting.")
             raise FileNotFoundError(f"No preprocessed CSV files found in {self.folders.preprocessed}")
             
-        # Find the file with the most recent modification time (mtime)
-        input_file = max(input_files, key=os.path.getmtime)
         logger.info(f"Selected latest file for cleaning: {input_file.name}")
         
         try:
-            # Load data, assuming timestamp is already a clean datetime column
-            self.df = pd.read_csv(input_file, parse_dates=["timestamp"])
+            # Load data, assuming timestamp is already a clean ISO datetime column.
+            # All column types are declared up front so pyarrow parses the timestamps
+            # natively, and the first data row is skipped while parsing (as per
+            # original logic) instead of being dropped from a copy afterwards.
+            self.df = read_csv(
+                input_file,
+                column_types={
+                    "timestamp": pa.timestamp("ns", tz="UTC"),
+                    "author": pa.string(),
+                    "message": pa.string(),
+                },
+                skip_rows_after_header=1,
+            )
         except Exception as e:
             logger.error(f"Failed to load data from {input_file}: {e}")
             raise
         
-        # Drop the first row and reset index as per original logic
-        self.df = self.df.drop(index=[0]).reset_index(drop=True)
-        
         logger.info("Starting cleaning and feature engineering steps...")
         
         # 1. Clean author names (Prerequisite for features)
@@ -207,8 +268,7 @@ class DataCleaner:
 # Helper function to load config (similar to preprocess.py's main)
 def _load_config() -> CleanConfig:
     """Loads configuration from config.toml and returns a CleanConfig object."""
-    with open("config.toml", "rb") as f:
-        config = tomllib.load(f)
+    config = load_toml_config()
 
     # Use the 'cleaned' folder path from the config for saving
     raw = Path(config["raw"])
@@ -228,16 +288,17 @@ def _load_config() -> CleanConfig:
     # Create the CleanConfig object
     clean_config = CleanConfig(
         folders=folders,
-        # No other specific config items needed for DataCleaner's init currently
+        write_csv=config.get("write_csv", False),
     )
     return clean_config
 
 # --- NEW PUBLIC FUNCTION ---
-def run_cleaning() -> Path:
+def run_cleaning(write_csv: bool | None = None) -> Path:
     """
     Public entry point for the data cleaning process to be called from other modules.
     
-    :return: Path to the final cleaned CSV file.
+    :param write_csv: Also write a CSV copy; None uses 'write_csv' from config.toml.
+    :return: Path to the final cleaned Parquet file.
     """
     try:
         config = _load_config()
@@ -246,6 +307,9 @@ def run_cleaning() -> Path:
         # Use return instead of sys.exit(1) for cleaner external calls
         raise RuntimeError("Failed to load cleaning configuration.")
 
+    if write_csv is not None:
+        config.write_csv = write_csv
+
     logger.info(f"Input path assumed from preprocessed folder: {config.folders.preprocessed}")
     
     # Run the cleaner
@@ -254,10 +318,13 @@ def run_cleaning() -> Path:
     return cleaner.run()
 
 @click.command()
-def main():
+@click.option(
+    "--write-csv/--no-write-csv", default=None, help="Also write a CSV copy (default: 'write_csv' in config.toml)"
+)
+def main(write_csv: bool | None):
     """Main entry point for the data cleaning process (CLI use)."""
     # Simply call the new run_cleaning function
-    run_cleaning()
+    run_cleaning(write_csv=write_csv)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
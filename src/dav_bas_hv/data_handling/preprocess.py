@@ -2,9 +2,7 @@
 ### Reads which type of device the WhatsApp data was exported from (iOS, Android, old version, or CSV)
 ### Saves the CSV file to the preprocess folder
 
-import re
 import sys
-import tomllib
 from datetime import datetime, timezone
 from pathlib import Path
 
@@ -12,12 +10,12 @@ import click
 import pandas as pd
 from loguru import logger
 
-from .settings import (BaseRegexes, Folders, PreprocessConfig,
+from .settings import (BaseRegexes, CompiledRegexes, Folders, PreprocessConfig,
                                   androidRegexes, csvRegexes, iosRegexes,
-                                  oldRegexes)
+                                  load_toml_config, oldRegexes)
 
 logger.remove()
-logger.add("logs/logfile.log", rotation="1 week", level="DEBUG")
+logger.add("logs/logfile.log", rotation="1 week", level="DEBUG", enqueue=True, backtrace=False, diagnose=False)
 logger.add(sys.stderr, level="INFO")
 
 logger.debug(f"Python path: {sys.path}")
@@ -26,13 +24,15 @@ class WhatsappPreprocessor:
     def __init__(self, config: PreprocessConfig):
         self.folders = config.folders
         self.regexes = config.regexes
+        # Compiled once here instead of per line in process()
+        self.patterns = CompiledRegexes.from_regexes(config.regexes)
         self.datetime_format = config.datetime_format
         self.drop_authors = config.drop_authors
 
 # Call method to process and save records
-    def __call__(self):
+    def __call__(self) -> Path:
         records, _ = self.process()
-        self.save(records)
+        return self.save(records)
 
 # Function to save records to a CSV file
     def save(self, records: list[tuple]) -> Path:
@@ -50,25 +50,36 @@ class WhatsappPreprocessor:
         appended = []
         datafile = self.folders.raw / self.folders.datafile
 
-        tsreg = self.regexes.timestamp
-        messagereg = self.regexes.message
-        authorreg = self.regexes.author
-
+        tsreg = self.patterns.timestamp
+        messagereg = self.patterns.message
+        authorreg = self.patterns.author
+        # With a fused pattern one match splits the whole line, read by group name;
+        # otherwise each pattern captures its part in group 1
+        fusedreg = self.patterns.fused
+        ts_group, author_group, msg_group = (
+            ("timestamp", "author", "message") if fusedreg is not None else (1, 1, 1)
+        )
+
+        # Iterate the file lazily, so the raw chat is read in buffered chunks
+        # instead of being held in memory as a list of all its lines
         with datafile.open(encoding="utf-8") as f:
-            for line_number, line in enumerate(f.readlines()):
-                ts = re.match(tsreg, line)
+            for line_number, line in enumerate(f):
+                ts = fusedreg.match(line) if fusedreg is not None else tsreg.match(line)
                 if ts:
                     try:
                         timestamp = datetime.strptime(
-                            ts.groups()[0], self.datetime_format
+                            ts.group(ts_group), self.datetime_format
                         ).replace(tzinfo=timezone.utc)
                     except ValueError as e:
                         logger.error(
                             f"Error while processing timestamp of line {line_number}: {e}"
                         )
                         continue
-                    msg_ = re.search(messagereg, line)
-                    author_ = re.search(authorreg, line)
+                    if fusedreg is not None:
+                        msg_ = author_ = ts
+                    else:
+                        msg_ = messagereg.search(line)
+                        author_ = authorreg.search(line)
                     if msg_ is None:
                         logger.error(
                             f"Could not find a message for line {line_number}. Please check the data and / or the message regex"
@@ -79,13 +90,12 @@ class WhatsappPreprocessor:
                             f"Could not find an author for line {line_number}. Please check the data and / or the author regex"
                         )
                         continue
-                    author = author_.groups()[0].strip()
+                    author = author_.group(author_group).strip()
                     if any(drop_author in author for drop_author in self.drop_authors):
                         logger.warning(f"Skipping author {author}")
                         continue
-                    clean_tilde = r"^~\u202f"
-                    author = re.sub(clean_tilde, "", author)
-                    msg = msg_.groups()[0].strip()
+                    author = author.removeprefix("~\u202f")
+                    msg = msg_.group(msg_group).strip()
                     records.append((timestamp, author, msg))
                 elif len(records) > 0:
                     appended.append(timestamp)
@@ -97,15 +107,14 @@ class WhatsappPreprocessor:
         return records, appended
 
 def run_preprocess(device: str = "android"):
-    with open("config.toml", "rb") as f:
-        config = tomllib.load(f) # Loading configuration from TOML file
-        raw = Path(config["raw"])
-        preprocessed = Path(config["preprocessed"])
-        cleaned = Path(config["cleaned"])
-        feature_added = Path(config["feature_added"])
-        datafile = Path(config["input"])
-        datetime_format = config["datetime_format"]
-        drop_authors = config["drop_authors"]
+    config = load_toml_config() # Loading configuration from TOML file
+    raw = Path(config["raw"])
+    preprocessed = Path(config["preprocessed"])
+    cleaned = Path(config["cleaned"])
+    feature_added = Path(config["feature_added"])
+    datafile = Path(config["input"])
+    datetime_format = config["datetime_format"]
+    drop_authors = tuple(config["drop_authors"])
 
     # Use function to select regexes based on device type from settings.py
     if device.lower() == "ios":
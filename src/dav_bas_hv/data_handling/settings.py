@@ -4,21 +4,86 @@ from dataclasses import dataclass
 # Import path to easily track and understand the filesystem patch
 from pathlib import Path
 
+# Read the config.toml file
+import tomllib
+
+# Compile the line parsing regexes once
+import re
+
+# Scan folders with a single stat per entry and match file names to glob patterns
+import os
+from fnmatch import fnmatchcase
+
+# Fingerprint plot inputs to skip re-rendering unchanged plots
+import hashlib
+
 # Give option to say variable can be None:
-from typing import Optional, Dict
+from typing import Literal, Optional, Dict, TYPE_CHECKING
 
 # Define a class 
 from pydantic import BaseModel
 
+# Read Parquet and CSV files. pandas and pyarrow are imported inside the readers,
+# so loading the config (e.g. from main.py) does not pay for importing them.
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
 HOUR = 60 * 60
 DAY = HOUR * 24
 
 # Consistent structure for three attributes
-
-class BaseRegexes(BaseModel):
+# A plain frozen dataclass: the patterns are fixed strings that need no validation
+@dataclass(frozen=True, slots=True)
+class BaseRegexes:
     timestamp: str
     author: str
     message: str
+    # Optional single pattern with named groups 'timestamp', 'author' and 'message'
+    # that matches exactly the lines the three patterns above split, in one pass
+    fused: Optional[str] = None
+
+def _compile_pattern(pattern: str) -> re.Pattern:
+    """
+    Compiles a regex with google-re2, which matches in linear time without
+    backtracking, when the optional 'google-re2' package is installed. Falls back
+    to the re module when it is not, or for patterns re2 does not support
+    (e.g. the lookbehind in oldRegexes).
+
+    :param pattern: The regex to compile.
+    :return: The compiled pattern; both expose match, search and group.
+    """
+    try:
+        import re2
+    except ImportError:
+        return re.compile(pattern)
+    try:
+        return re2.compile(pattern)
+    except re2.error:
+        return re.compile(pattern)
+
+# The same three patterns compiled, so per-line matching skips the re module's cache lookup
+@dataclass(frozen=True)
+class CompiledRegexes:
+    timestamp: re.Pattern
+    author: re.Pattern
+    message: re.Pattern
+    fused: Optional[re.Pattern] = None
+
+    @classmethod
+    def from_regexes(cls, regexes: BaseRegexes) -> "CompiledRegexes":
+        """
+        Compiles the patterns of a BaseRegexes, with re2 where available.
+
+        :param regexes: The raw pattern strings.
+        :return: The compiled patterns.
+        """
+        return cls(
+            timestamp=_compile_pattern(regexes.timestamp),
+            author=_compile_pattern(regexes.author),
+            message=_compile_pattern(regexes.message),
+            fused=_compile_pattern(regexes.fused) if regexes.fused is not None else None,
+        )
 
 # Apply date formats per software type
 
@@ -26,12 +91,14 @@ iosRegexes = BaseRegexes(
     timestamp=r"\[(.+?)]\s.+?:.+",
     author=r"\[.+?]\s(.+?):.+",
     message=r"\[.+?]\s.+?:(.+)",
+    fused=r"\[(?P<timestamp>.+?)]\s(?P<author>.+?):(?P<message>.+)",
 )
 
 androidRegexes = BaseRegexes(
     timestamp=r"(.+?)\s-\s.+?:.+",
     author=r".+?\s-\s(.+?):.+",
     message=r".+?\s-\s.+?:(.*)",
+    fused=r"(?P<timestamp>.+?)\s-\s(?P<author>.+?):(?P<message>.+)",
 )
 
 oldRegexes = BaseRegexes(
@@ -47,7 +114,8 @@ csvRegexes = BaseRegexes(
 )
 
 # Automaticcaly generate __init__ method:
-@dataclass
+# frozen makes the folders hashable (usable as a cache key), slots drops the per-instance __dict__
+@dataclass(frozen=True, slots=True)
 class Folders:
     raw: Path
     preprocessed: Path
@@ -56,11 +124,12 @@ class Folders:
     datafile: Path
 
 # Preprocess settings to format date, drop authors, apply regex
-class PreprocessConfig(BaseModel):
+@dataclass(frozen=True, slots=True)
+class PreprocessConfig:
     folders: Folders
     regexes: BaseRegexes
     datetime_format: str
-    drop_authors: list[str] = []
+    drop_authors: tuple[str, ...] = ()
 
 # Clean settings 
 class CleanConfig(BaseModel):
@@ -69,4 +138,168 @@ class CleanConfig(BaseModel):
     city_authors: list[str] = []
     tech_background_authors: list[str] = []
     partner_authors: list[str] = []
-    partner_dates: Dict[str, str] = {} # Key is author name, value is date string (e.g., "2024-12-01")
\ No newline at end of file
+    partner_dates: Dict[str, str] = {} # Key is author name, value is date string (e.g., "2024-12-01")
+    write_csv: bool = False # Also write a CSV copy next to the Parquet output
+    sentiment_backend: Literal["textblob", "vader"] = "textblob" # "vader" needs the optional vaderSentiment package
+
+# Parsed config files per path, reused as long as the file's mtime is unchanged
+_config_cache: Dict[Path, tuple[float, dict]] = {}
+
+def load_toml_config(config_path: str | Path = "config.toml") -> dict:
+    """
+    Loads the TOML configuration file, parsing it only once per process
+    for as long as the file is not modified.
+
+    :param config_path: Path to the TOML configuration file.
+    :return: The parsed configuration dictionary.
+    """
+    path = Path(config_path).resolve()
+    mtime = path.stat().st_mtime
+    cached = _config_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        with path.open("rb") as f:
+            cached = (mtime, tomllib.load(f))
+        _config_cache[path] = cached
+    return cached[1]
+
+# Latest matching file per (folder, pattern), reused while the folder's mtime is unchanged
+_latest_file_cache: Dict[tuple[Path, str], tuple[float, Optional[Path]]] = {}
+
+def find_latest_file(folder: Path, pattern: str) -> Optional[Path]:
+    """
+    Finds the most recently modified file in a folder matching a glob pattern.
+    Adding, removing or renaming files updates the folder's mtime, which
+    invalidates the cached result.
+
+    :param folder: The folder to search in.
+    :param pattern: The glob pattern to match (e.g. "*-features.csv").
+    :return: Path to the latest matching file, or None if there is none.
+    """
+    if not folder.is_dir():
+        return None
+    key = (folder.resolve(), pattern)
+    folder_mtime = folder.stat().st_mtime
+    cached = _latest_file_cache.get(key)
+    if cached is None or cached[0] != folder_mtime:
+        # One directory scan; DirEntry.stat() reuses its result, so each file is stat-ed once
+        with os.scandir(folder) as entries:
+            matches = [entry for entry in entries if fnmatchcase(entry.name, pattern) and entry.is_file()]
+        latest = Path(max(matches, key=lambda e: e.stat().st_mtime).path) if matches else None
+        cached = (folder_mtime, latest)
+        _latest_file_cache[key] = cached
+    return cached[1]
+
+def read_parquet(path: Path, columns: Optional[list[str]] = None) -> "pd.DataFrame":
+    """
+    Reads a Parquet file into a DataFrame, loading only the requested columns.
+    Column chunks are pre-buffered so consecutive reads are coalesced into
+    fewer, larger I/O requests.
+
+    :param path: Path to the Parquet file.
+    :param columns: Columns to load. Columns missing from the file are skipped,
+        so callers can still report them; None loads every column.
+    :return: The loaded DataFrame.
+    """
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path, pre_buffer=True, buffer_size=1 << 20)
+    if columns is not None:
+        available = set(parquet_file.schema_arrow.names)
+        columns = [col for col in columns if col in available]
+    table = parquet_file.read(columns=columns, use_threads=True, use_pandas_metadata=True)
+    return table.to_pandas(self_destruct=True)
+
+# Cell values read as missing, the same set pandas.read_csv uses by default
+_CSV_NULL_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND",
+    "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+]
+
+def read_csv(
+    path: Path,
+    column_types: Dict[str, "pa.DataType"],
+    skip_rows_after_header: int = 0,
+    include_columns: Optional[list[str]] = None,
+) -> "pd.DataFrame":
+    """
+    Reads a CSV file with pyarrow's multithreaded parser, converting each column
+    straight to its declared type (e.g. timestamps) instead of inferring it.
+    Missing values match pandas.read_csv, and text columns become pandas 'string'.
+
+    :param path: Path to the CSV file.
+    :param column_types: Arrow type per column, e.g. {"timestamp": pa.timestamp("ns", tz="UTC")}.
+    :param skip_rows_after_header: Number of data rows to skip directly after the header.
+    :param include_columns: Columns to load, in this order; the rest are never
+        converted. None loads every column.
+    :return: The loaded DataFrame.
+    """
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.csv as pcsv
+
+    table = pcsv.read_csv(
+        path,
+        read_options=pcsv.ReadOptions(skip_rows_after_names=skip_rows_after_header),
+        convert_options=pcsv.ConvertOptions(
+            column_types=column_types,
+            null_values=_CSV_NULL_VALUES,
+            strings_can_be_null=True,
+            include_columns=include_columns,
+        ),
+    )
+    return table.to_pandas(types_mapper={pa.string(): pd.StringDtype()}.get)
+
+def plot_cache_key(*paths: Path, extra: Optional[str] = None) -> str:
+    """
+    Fingerprints the files a plot depends on (its input data and the module
+    that draws it) by path, modification time and size.
+
+    :param paths: The files the plot is built from.
+    :param extra: Other settings the plot depends on (e.g. "dpi=300"), hashed
+        along with the files; None leaves the key of the files alone unchanged.
+    :return: A hex digest that changes whenever one of the files changes.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for path in paths:
+        stat = Path(path).stat()
+        digest.update(f"{Path(path).resolve()}|{stat.st_mtime_ns}|{stat.st_size}\n".encode())
+    if extra is not None:
+        digest.update(f"extra|{extra}\n".encode())
+    return digest.hexdigest()
+
+def file_digest(path: Path) -> str:
+    """
+    Hashes the contents of a file with BLAKE2b. Unlike plot_cache_key this ignores
+    the file's name and modification time, so a regenerated file with the same
+    contents keeps the same digest.
+
+    :param path: The file to hash.
+    :return: The hex digest of the file's contents.
+    """
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, lambda: hashlib.blake2b(digest_size=16)).hexdigest()
+
+def _plot_key_file(output_path: Path) -> Path:
+    """Returns the sidecar file that stores the cache key of a saved plot."""
+    return output_path.with_name(f".{output_path.name}.key")
+
+def is_plot_cached(output_path: Path, key: str) -> bool:
+    """
+    Checks whether the plot at output_path was rendered from inputs with the given key.
+
+    :param output_path: Path of the plot image.
+    :param key: The key from plot_cache_key for the current inputs.
+    :return: True if the image exists and was saved with the same key.
+    """
+    key_file = _plot_key_file(output_path)
+    return output_path.exists() and key_file.exists() and key_file.read_text() == key
+
+def mark_plot_cached(output_path: Path, key: str) -> None:
+    """
+    Records the cache key of a freshly saved plot. Call this only after the image
+    has been written, so an interrupted save is never mistaken for a cached plot.
+
+    :param output_path: Path of the plot image.
+    :param key: The key from plot_cache_key for the inputs it was rendered from.
+    """
+    _plot_key_file(output_path).write_text(key)
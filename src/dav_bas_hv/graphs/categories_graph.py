@@ -2,19 +2,21 @@
 
 # import packages
 import sys
-import tomllib
 from pathlib import Path
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import matplotlib
+matplotlib.use("Agg") # Plots are only saved to file, never shown
 import matplotlib.pyplot as plt
 from loguru import logger
-import os
 
 # Assuming correct path for settings is now:
-from data_handling.settings import Folders, CleanConfig
+from data_handling.settings import Folders, CleanConfig, find_latest_file, load_toml_config, read_parquet, read_csv, plot_cache_key, is_plot_cached, mark_plot_cached
 
 # --- LOGGING SETUP (Copied from time_series.py) ---
 logger.remove()
-logger.add("logs/logfile.log", rotation="1 week", level="DEBUG")
+logger.add("logs/logfile.log", rotation="1 week", level="DEBUG", enqueue=True, backtrace=False, diagnose=False)
 logger.add(sys.stderr, level="INFO")
 
 
@@ -29,6 +31,10 @@ class CategoriesAnalyzer:
     
     # Renamed the class from MeetingUpQuestionsAnalyzer to CategoriesAnalyzer
     # to be more generic, following the file name.
+
+    # Only these columns are loaded from the feature file, with their CSV types
+    CSV_TYPES = {'year': pa.int16(), 'is_question': pa.int8(), 'mentions_meet_up': pa.int8(), 'living_in_city': pa.int8()}
+    REQUIRED_COLS = list(CSV_TYPES)
     
     def __init__(self, config: CleanConfig, output_filename: str):
         """
@@ -53,46 +59,34 @@ class CategoriesAnalyzer:
         """
         logger.info("    -> Preparing data and calculating yearly percentages.")
         
-        # 1. Ensure the combined flag is correctly calculated
-        df['is_meeting_up_question'] = (
-            (df['is_question'] == 1) & (df['mentions_meet_up'] == 1)
-        ).astype(int)
-
-        # 2. Group by both 'year' and the condition ('living_in_city') and sum the questions
-        yearly_counts = df.groupby(['year', 'living_in_city'])[
-            'is_meeting_up_question'
-        ].sum().reset_index()
-
-        # 3. Pivot the table to get the city/non-city counts as separate columns
-        yearly_stats = yearly_counts.pivot(
-            index='year',
-            columns='living_in_city',
-            values='is_meeting_up_question'
-        ).fillna(0).reset_index()
+        # 1. The combined flag: 0/1 flags multiply to their logical AND
+        is_meeting_up_question = (
+            df['is_question'].to_numpy(dtype=np.int8) * df['mentions_meet_up'].to_numpy(dtype=np.int8)
+        ).astype(bool)
 
-        # 4. Rename columns for clarity (0 is non_city, 1 is city)
-        yearly_stats.columns = [
-            'year', 
-            'meeting_up_questions_hometown', 
-            'meeting_up_questions_away_from_hometown'
-        ]
-
-        # 5. Calculate the total meeting up questions
-        yearly_stats['total_meeting_up_questions'] = (
-            yearly_stats['meeting_up_questions_hometown'] + yearly_stats['meeting_up_questions_away_from_hometown']
-        )
+        # 2. Count the questions per (year, living_in_city) cell in one pass.
+        # Years are factorized in sorted order; column 0 is non-city, 1 is city.
+        year_idx, years = pd.factorize(df['year'], sort=True)
+        cell_idx = year_idx * 2 + df['living_in_city'].to_numpy(dtype=np.int64)
+        counts = np.bincount(
+            cell_idx[is_meeting_up_question], minlength=2 * len(years)
+        ).reshape(len(years), 2)
 
-        # 6. Calculate the percentages (%)
-        # We use .div() for clarity and efficiency when dividing multiple columns
-        yearly_stats[['pct_hometown_living', 'pct_away_from_hometown_living']] = (
-            yearly_stats[['meeting_up_questions_hometown', 'meeting_up_questions_away_from_hometown']]
-            .div(yearly_stats['total_meeting_up_questions'], axis=0) * 100
+        # 3. Totals and percentages (%); years without questions get 0%
+        total = counts.sum(axis=1)
+        pct = np.divide(
+            counts * 100.0, total[:, None], out=np.zeros(counts.shape), where=total[:, None] > 0
         )
 
-        # Handle cases where total_meeting_up_questions is 0 (division by zero results in NaN)
-        yearly_stats[['pct_hometown_living', 'pct_away_from_hometown_living']] = yearly_stats[
-            ['pct_hometown_living', 'pct_away_from_hometown_living']
-        ].fillna(0)
+        # 4. Assemble the result directly from the arrays (0 is non_city, 1 is city)
+        yearly_stats = pd.DataFrame({
+            'year': np.asarray(years),
+            'meeting_up_questions_hometown': counts[:, 0],
+            'meeting_up_questions_away_from_hometown': counts[:, 1],
+            'total_meeting_up_questions': total,
+            'pct_hometown_living': pct[:, 0],
+            'pct_away_from_hometown_living': pct[:, 1],
+        })
         
         return yearly_stats
         
@@ -166,22 +160,28 @@ class CategoriesAnalyzer:
         
         return fig
 
-    def run(self) -> Path:
+    def run(self, invalidate_cache: bool = False) -> Path:
         """
         Runs the plotting pipeline: loads latest data, performs preparation, 
         generates plot, and saves the final image.
+        The plot is only re-rendered when the input file or this module changed
+        since it was last saved, unless invalidate_cache is set.
         
+        :param invalidate_cache: Re-render the plot even if a cached image is valid.
         :return: Path to the final saved plot image.
         """
         # --- File Discovery (Input) ---
         # Look for the latest feature-added file, same as time_series.py
-        input_files = list(self.folders.feature_added.glob("*-features.csv"))
+        # Prefer the Parquet output; CSV is only written when 'write_csv' is enabled
+        input_path = (
+            find_latest_file(self.folders.feature_added, "*-features.parq")
+            or find_latest_file(self.folders.feature_added, "*-features.csv")
+        )
         
-        if not input_files:
-            logger.error(f"No *-features.csv files found in {self.folders.feature_added}. Exiting.")
-            raise FileNotFoundError(f"No feature-engineered CSV files found in {self.folders.feature_added}")
-            
-        input_path = max(input_files, key=os.path.getmtime)
+        if input_path is None:
+            logger.error(f"No *-features.parq or *-features.csv files found in {self.folders.feature_added}. Exiting.")
+            raise FileNotFoundError(f"No feature-engineered files found in {self.folders.feature_added}")
+
         logger.info(f"Selected latest file for analysis: {input_path.name}")
         
         # --- Output Path Construction ---
@@ -189,11 +189,20 @@ class CategoriesAnalyzer:
         plot_output_dir.mkdir(parents=True, exist_ok=True)
         self.output_path = plot_output_dir / self.output_filename
 
+        # --- Skip rendering when the saved plot is up to date ---
+        cache_key = plot_cache_key(input_path, Path(__file__))
+        if not invalidate_cache and is_plot_cached(self.output_path, cache_key):
+            logger.info(f"Plot {self.output_path.name} is up to date with {input_path.name}. Skipping rendering.")
+            return self.output_path
+
         logger.info(f"Loading data for categories analysis from: {input_path.name}")
         
         try:
             # Load the data - assuming no special date parsing needed here
-            self.df = pd.read_csv(input_path)
+            if input_path.suffix == ".parq":
+                self.df = read_parquet(input_path, columns=self.REQUIRED_COLS)
+            else:
+                self.df = read_csv(input_path, column_types=self.CSV_TYPES, include_columns=self.REQUIRED_COLS)
             
             # Ensure 'year' is available, which usually requires 'timestamp' to be loaded and processed,
             # but since 'year' is a required col, we assume it's pre-calculated in the feature file.
@@ -203,10 +212,9 @@ class CategoriesAnalyzer:
             raise
         
         # Check if the necessary columns are present
-        required_cols = ['year', 'is_question', 'mentions_meet_up', 'living_in_city']
-        if not all(col in self.df.columns for col in required_cols):
-            logger.error(f"Missing required columns for plotting: {required_cols}")
-            raise ValueError(f"Data is missing required columns: {required_cols}")
+        if not all(col in self.df.columns for col in self.REQUIRED_COLS):
+            logger.error(f"Missing required columns for plotting: {self.REQUIRED_COLS}")
+            raise ValueError(f"Data is missing required columns: {self.REQUIRED_COLS}")
             
         logger.info("Starting yearly questions analysis and visualization...")
         
@@ -219,6 +227,7 @@ class CategoriesAnalyzer:
         # 3. Save the figure
         logger.info(f"Saving yearly questions plot to: {self.output_path.name}")
         fig.savefig(self.output_path, dpi=300)
+        mark_plot_cached(self.output_path, cache_key)
         
         logger.info("Yearly questions analysis complete.")
         plt.close(fig) 
@@ -228,8 +237,7 @@ class CategoriesAnalyzer:
 # --- Configuration Loading and Public Function (Copied from time_series.py) ---
 def _load_config() -> CleanConfig:
     """Loads configuration from config.toml and returns a CleanConfig object."""
-    with open("config.toml", "rb") as f:
-        config = tomllib.load(f)
+    config = load_toml_config()
 
     raw = Path(config["raw"])
     preprocessed = Path(config["preprocessed"])
@@ -2,23 +2,23 @@
 
 # import packages
 import sys
-import tomllib
 from pathlib import Path
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import matplotlib
+matplotlib.use("Agg") # Plots are only saved to file, never shown
 import matplotlib.pyplot as plt
-import seaborn as sns
 from loguru import logger
 from scipy import stats
 from matplotlib.ticker import FixedLocator
-import os
 
 # Assuming correct path for settings is now:
-from data_handling.settings import Folders, CleanConfig 
+from data_handling.settings import Folders, CleanConfig, find_latest_file, load_toml_config, read_parquet, read_csv, plot_cache_key, is_plot_cached, mark_plot_cached 
 
 # --- LOGGING SETUP (Copied from time_series.py) ---
 logger.remove()
-logger.add("logs/logfile.log", rotation="1 week", level="DEBUG")
+logger.add("logs/logfile.log", rotation="1 week", level="DEBUG", enqueue=True, backtrace=False, diagnose=False)
 logger.add(sys.stderr, level="INFO")
 
 
@@ -30,6 +30,10 @@ class CorrelationAnalyzer:
     Specific analysis: Point-Biserial Correlation and T-test for 'tech_background'
     and 'has_emoji'.
     """
+
+    # Only these columns are loaded from the feature file, with their CSV types
+    CSV_TYPES = {'tech_background': pa.int8(), 'has_emoji': pa.int8()}
+    REQUIRED_COLS = list(CSV_TYPES)
     
     def __init__(self, config: CleanConfig, output_filename: str):
         """
@@ -52,14 +56,44 @@ class CorrelationAnalyzer:
         """
         logger.info("    -> Calculating Point-Biserial Correlation and T-test.")
         
-        # Calculate the Point-Biserial Correlation Coefficient
-        correlation_coefficient, _ = stats.pearsonr(df['tech_background'], df['has_emoji'])
+        # Both columns are 0/1, so every statistic follows from four counts
+        x = df['tech_background'].to_numpy(dtype=np.int8)
+        y = df['has_emoji'].to_numpy(dtype=np.int8)
+        n = x.size
+        n1 = int(x.sum())                       # messages from the technical group
+        n0 = n - n1
+        s1 = int(np.bitwise_and(x, y).sum())    # of which contain an emoji
+        s0 = int(y.sum()) - s1
         
-        # T-test for difference in means (proportions) between the two groups
-        group_tech = df[df['tech_background'] == 1]['has_emoji']
-        group_nontech = df[df['tech_background'] == 0]['has_emoji']
-        # Independent samples t-test
-        t_stat, p_value = stats.ttest_ind(group_tech, group_nontech, equal_var=False) 
+        # Degenerate input gives NaN, as scipy.stats.pearsonr/ttest_ind do, instead of
+        # raising ZeroDivisionError: no messages in a group (n1 or n0 == 0), a group
+        # with a single message (no ddof=1 variance) or an emoji column that is all
+        # 0 or all 1 (p in {0, 1}). NumPy floats turn those divisions into NaN.
+        with np.errstate(divide='ignore', invalid='ignore'):
+            m1 = np.float64(s1) / n1 if n1 else np.nan  # proportions with emoji per group
+            m0 = np.float64(s0) / n0 if n0 else np.nan
+            p = np.float64(s0 + s1) / n
+
+            # Point-Biserial Correlation Coefficient (Pearson r for a binary x)
+            if n1 and n0 and 0 < p < 1:
+                correlation_coefficient = (m1 - m0) * np.sqrt(n1 * n0) / (n * np.sqrt(p * (1 - p)))
+            else:
+                correlation_coefficient = np.nan
+            
+            # Welch's t-test for difference in means (proportions) between the two groups,
+            # using the sample (ddof=1) variance of a Bernoulli variable
+            if n1 >= 2 and n0 >= 2:
+                var1 = m1 * (1 - m1) * n1 / (n1 - 1)
+                var0 = m0 * (1 - m0) * n0 / (n0 - 1)
+                se1, se0 = var1 / n1, var0 / n0
+                t_stat = (m1 - m0) / np.sqrt(se1 + se0)
+                dof = (se1 + se0) ** 2 / (se1 ** 2 / (n1 - 1) + se0 ** 2 / (n0 - 1))
+                # Both groups constant: scipy falls back to 1 degree of freedom
+                if np.isnan(dof):
+                    dof = 1.0
+                p_value = 2 * stats.t.sf(abs(t_stat), dof)
+            else:
+                t_stat = p_value = np.nan
         
         return correlation_coefficient, t_stat, p_value
         
@@ -74,51 +108,66 @@ class CorrelationAnalyzer:
         :return: The Matplotlib Figure object.
         """
         logger.info("    -> Generating Bar Plot for proportions.")
+        # seaborn is only needed for this plot, so it is imported on first use
+        import seaborn as sns
         
-        # Map the binary variable to clear labels for plotting
-        df['tech_label'] = df['tech_background'].astype(int).astype(str).replace(
-            {'0': 'No Technical Background', '1': 'Technical Background'}
-        )
-
-        # --- Calculate Group Sizes (N) ---
-        # Ensure consistent order for N-labels:
+        # --- Aggregate per group once: proportion, group size (N) and 95% CI ---
+        # tech_background is 0/1, so two bincounts give the group sizes and emoji
+        # counts; only the two aggregated rows get a text label.
+        # Ensure consistent order for the bars and N-labels:
         categories = ['No Technical Background', 'Technical Background']
-        group_counts = df['tech_label'].value_counts().reindex(categories, fill_value=0).to_dict()
+        x = df['tech_background'].to_numpy(dtype=np.int8)
+        counts = np.bincount(x, minlength=2)
+        emoji_counts = np.bincount(x, weights=df['has_emoji'].to_numpy(), minlength=2)
+        agg = pd.DataFrame({'tech_label': categories, 'count': counts})
+        # A group without messages gets a NaN mean and one with a single message a NaN
+        # std (no ddof=1 variance), as pandas' groupby std gives, without warnings
+        with np.errstate(divide='ignore', invalid='ignore'):
+            agg['mean'] = emoji_counts / counts
+            # Sample (ddof=1) standard deviation of a 0/1 variable
+            agg['std'] = np.sqrt(agg['mean'] * (1 - agg['mean']) * counts / (counts - 1))
+            agg['ci'] = 1.96 * agg['std'] / np.sqrt(agg['count'])
         
+        # The style categories_graph.py used to leave behind for this plot when all
+        # plots ran in one process; set here now that each plot runs in its own worker
+        plt.style.use('seaborn-v0_8-whitegrid')
         # Create the figure and axes
         fig, ax = plt.subplots(figsize=(8, 6))
 
-        # Use seaborn for a bar plot
+        # Use seaborn for a bar plot of the two aggregated rows; the error bars are
+        # drawn from the normal-approximation CI instead of bootstrapping every row
         sns.barplot(
             x='tech_label', 
-            y='has_emoji', 
-            data=df,
+            y='mean', 
+            data=agg,
             hue='tech_label',
             order=categories, # Ensure order matches the N-labels
             legend=False,
-            palette=['#ff7f0e', '#808080'],
-            errcolor='gray', 
-            capsize=0.1,
+            palette={'Technical Background': '#ff7f0e', 'No Technical Background': '#808080'},
+            errorbar=None,
             linewidth=1.5,
             ax=ax
         )
+        ax.errorbar(
+            x=range(len(categories)),
+            y=agg['mean'],
+            yerr=agg['ci'],
+            fmt='none',
+            ecolor='gray',
+            elinewidth=3,
+            capthick=3,
+            capsize=20,
+        )
 
 
         # --- Add N-labels above the bars ---
-        for bar, category_label in zip(ax.patches, categories):
-            N_count = group_counts.get(category_label, 0)
-            N_text = f"N={N_count}"
-
-            # Add the text label slightly above the bar/error bar
-            ax.text(
-                bar.get_x() + bar.get_width() / 2, # Center the text horizontally
-                bar.get_height() + 0.01,           # Position text slightly above the bar
-                N_text,
-                ha='center',                       
-                va='bottom',                       
-                fontsize=10,
-                color='black'
-            )
+        # seaborn draws one container per hue level, in the same order as 'categories'
+        for container, N_count in zip(ax.containers, agg['count']):
+            # A group without messages has no bar to label
+            if N_count == 0:
+                continue
+            # Padding in points, about 0.01 on the y-axis as the labels had before
+            ax.bar_label(container, labels=[f"N={N_count}"], padding=18, fontsize=10, color='black')
 
         # --- Add Statistical Annotation to the Graph ---
         corr_text = f"Correlation (r): {correlation_coefficient:.2f}"
@@ -160,21 +209,27 @@ class CorrelationAnalyzer:
         
         return fig
 
-    def run(self) -> Path:
+    def run(self, invalidate_cache: bool = False) -> Path:
         """
         Runs the correlation analysis pipeline: loads latest data, performs preparation, 
         generates plot, and saves the final image.
+        The plot is only re-rendered when the input file or this module changed
+        since it was last saved, unless invalidate_cache is set.
         
+        :param invalidate_cache: Re-render the plot even if a cached image is valid.
         :return: Path to the final saved plot image.
         """
         # --- File Discovery (Input) ---
-        input_files = list(self.folders.feature_added.glob("*-features.csv"))
+        # Prefer the Parquet output; CSV is only written when 'write_csv' is enabled
+        input_path = (
+            find_latest_file(self.folders.feature_added, "*-features.parq")
+            or find_latest_file(self.folders.feature_added, "*-features.csv")
+        )
         
-        if not input_files:
-            logger.error(f"No *-features.csv files found in {self.folders.feature_added}. Exiting.")
-            raise FileNotFoundError(f"No feature-engineered CSV files found in {self.folders.feature_added}")
-            
-        input_path = max(input_files, key=os.path.getmtime)
+        if input_path is None:
+            logger.error(f"No *-features.parq or *-features.csv files found in {self.folders.feature_added}. Exiting.")
+            raise FileNotFoundError(f"No feature-engineered files found in {self.folders.feature_added}")
+
         logger.info(f"Selected latest file for analysis: {input_path.name}")
         
         # --- Output Path Construction ---
@@ -182,25 +237,29 @@ class CorrelationAnalyzer:
         plot_output_dir.mkdir(parents=True, exist_ok=True)
         self.output_path = plot_output_dir / self.output_filename
 
+        # --- Skip rendering when the saved plot is up to date ---
+        cache_key = plot_cache_key(input_path, Path(__file__))
+        if not invalidate_cache and is_plot_cached(self.output_path, cache_key):
+            logger.info(f"Plot {self.output_path.name} is up to date with {input_path.name}. Skipping rendering.")
+            return self.output_path
+
         logger.info(f"Loading data for correlation analysis from: {input_path.name}")
         
         try:
             # Attempt to load Parquet first, then fallback to CSV
-            parquet_path = input_path.with_suffix(".parq")
-            if parquet_path.exists():
-                self.df = pd.read_parquet(parquet_path)
+            if input_path.suffix == ".parq":
+                self.df = read_parquet(input_path, columns=self.REQUIRED_COLS)
             else:
-                self.df = pd.read_csv(input_path)
+                self.df = read_csv(input_path, column_types=self.CSV_TYPES, include_columns=self.REQUIRED_COLS)
                 
         except Exception as e:
             logger.error(f"Failed to load data from {input_path}: {e}")
             raise
         
         # Check if the necessary columns are present
-        required_cols = ['tech_background', 'has_emoji']
-        if not all(col in self.df.columns for col in required_cols):
-            logger.error(f"Missing required columns for plotting: {required_cols}")
-            raise ValueError(f"Data is missing required columns: {required_cols}")
+        if not all(col in self.df.columns for col in self.REQUIRED_COLS):
+            logger.error(f"Missing required columns for plotting: {self.REQUIRED_COLS}")
+            raise ValueError(f"Data is missing required columns: {self.REQUIRED_COLS}")
             
         logger.info("Starting correlation analysis and visualization...")
         
@@ -213,6 +272,7 @@ class CorrelationAnalyzer:
         # 3. Save the figure
         logger.info(f"Saving correlation plot to: {self.output_path.name}")
         fig.savefig(self.output_path, dpi=300)
+        mark_plot_cached(self.output_path, cache_key)
         
         logger.info("Correlation analysis complete.")
         plt.close(fig) 
@@ -222,8 +282,7 @@ class CorrelationAnalyzer:
 # --- Configuration Loading and Public Function (Copied from time_series.py) ---
 def _load_config() -> CleanConfig:
     """Loads configuration from config.toml and returns a CleanConfig object."""
-    with open("config.toml", "rb") as f:
-        config = tomllib.load(f)
+    config = load_toml_config()
 
     raw = Path(config["raw"])
     preprocessed = Path(config["preprocessed"])
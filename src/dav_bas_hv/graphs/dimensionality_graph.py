@@ -2,31 +2,38 @@
 
 # import packages
 import sys
-import tomllib
+import inspect
 from pathlib import Path
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use("Agg") # Plots are only saved to file, never shown
 import matplotlib.pyplot as plt
 from loguru import logger
 # Import the specific SVD implementation from scikit-learn
 from sklearn.decomposition import TruncatedSVD
-from sklearn.preprocessing import StandardScaler
-import os
 
 # Assuming correct path for settings is now:
-from data_handling.settings import Folders, CleanConfig 
+from data_handling.settings import Folders, CleanConfig, find_latest_file, load_toml_config, read_parquet, read_csv, plot_cache_key, is_plot_cached, mark_plot_cached 
 
 # --- LOGGING SETUP (Copied from time_series.py) ---
 logger.remove()
-logger.add("logs/logfile.log", rotation="1 week", level="DEBUG")
+logger.add("logs/logfile.log", rotation="1 week", level="DEBUG", enqueue=True, backtrace=False, diagnose=False)
 logger.add(sys.stderr, level="INFO")
 
+# Feature matrices at least this large are decomposed on the GPU when cuML is installed
+GPU_MIN_BYTES = 100 * 1024 * 1024
+
 
 class SVDAnalyzer:
     """
     A class to perform Single Value Decomposition (SVD) on the 
     feature-engineered DataFrame for dimensionality reduction and factor interpretation.
     """
+    # The steps that produce the saved curve, loadings and reduced data; the drawing
+    # code in _generate_plot is left out so a restyled plot reuses the saved curve
+    SVD_STEPS = ("_load_data", "_run_svd", "_run_svd_gpu", "_scan_svd", "_find_knee", "_perform_reduction_and_interpret")
+
     def __init__(self, config: CleanConfig, output_filename: str):
         """
         Initializes the analyzer, using config for folder paths.
@@ -51,11 +58,11 @@ class SVDAnalyzer:
         logger.info(f"Loading data for SVD analysis from: {input_path.name}")
         try:
             # Attempt to load Parquet first, then fallback to CSV
-            parquet_path = input_path.with_suffix(".parq")
-            if parquet_path.exists():
-                self.df = pd.read_parquet(parquet_path)
+            if input_path.suffix == ".parq":
+                self.df = read_parquet(input_path)
             else:
-                self.df = pd.read_csv(input_path) 
+                # Column types are inferred by pyarrow's multithreaded parser
+                self.df = read_csv(input_path, column_types={})
                 
         except Exception as e:
             logger.error(f"Failed to load data from {input_path}: {e}")
@@ -63,9 +70,10 @@ class SVDAnalyzer:
             
         # 1. Identify numerical columns for SVD
         # NOTE: Using config_dict here to access the specific SVD settings
-        exclude_cols = config_dict.get('svd_exclude_cols', ['author_id', 'message_id', 'timestamp'])
+        exclude_cols = set(config_dict.get('svd_exclude_cols', ['author_id', 'message_id', 'timestamp']))
         numerical_cols = self.df.select_dtypes(include=np.number).columns
-        self.feature_cols = [col for col in numerical_cols if col not in exclude_cols]
+        # Set difference in pandas, keeping the original column order
+        self.feature_cols = list(numerical_cols.difference(exclude_cols, sort=False))
 
         if not self.feature_cols:
             logger.error("No suitable numerical features found for SVD after exclusion.")
@@ -75,39 +83,112 @@ class SVDAnalyzer:
         
         # 2. Scale the data
         logger.info("Standardizing feature matrix...")
-        scaler = StandardScaler()
-        # Use a copy of the original feature matrix for safe scaling and handle potential NaNs
-        self.A = scaler.fit_transform(self.df[self.feature_cols].fillna(0)) 
+        # Extract a single float32 matrix (NaNs become 0) and standardize it in place,
+        # instead of a fillna copy plus the float64 buffer from StandardScaler
+        X = self.df[self.feature_cols].to_numpy(dtype=np.float32, na_value=0, copy=False)
+        X -= X.mean(axis=0, dtype=np.float64).astype(np.float32)
+        std = X.std(axis=0, ddof=0, dtype=np.float64).astype(np.float32)
+        # Constant columns keep a scale of 1 (as StandardScaler does) to avoid dividing by 0
+        std[std == 0] = 1.0
+        X /= std
+        self.A = X
         
     def _run_svd(self, n_components: int = None):
         """
         Performs SVD and returns the model. If n_components is None, 
-        it calculates the full explained variance.
+        it calculates the full explained variance. Large matrices use the optional
+        cuML GPU solver when it is installed; otherwise scikit-learn is used.
         """
         n_comp = n_components if n_components else min(self.A.shape) - 1
         
+        if self.A.nbytes >= GPU_MIN_BYTES:
+            svd = self._run_svd_gpu(n_comp)
+            if svd is not None:
+                return svd
+        
         logger.info(f"    -> Performing Truncated SVD with {n_comp} components.")
         
-        svd = TruncatedSVD(n_components=n_comp)
+        # Randomized solver with a little oversampling; fixed seed for reproducible factors
+        svd = TruncatedSVD(
+            n_components=n_comp,
+            algorithm="randomized",
+            n_oversamples=10,
+            n_iter=4,
+            random_state=0,
+        )
         svd.fit(self.A)
         
         return svd
 
-    def _generate_plot(self, svd_model: TruncatedSVD) -> Path:
+    def _run_svd_gpu(self, n_comp: int):
+        """
+        Performs SVD on the GPU with cuML's Jacobi solver. The fitted attributes are
+        returned as NumPy arrays, so the model is a drop-in for the scikit-learn one.
+        
+        :param n_comp: The number of components.
+        :return: The fitted cuML TruncatedSVD model, or None if cuML is not installed.
+        """
+        try:
+            from cuml.decomposition import TruncatedSVD as CuTruncatedSVD
+        except ImportError:
+            logger.debug("cuML is not installed; using the scikit-learn SVD.")
+            return None
+        
+        logger.info(f"    -> Performing Truncated SVD with {n_comp} components on the GPU.")
+        svd = CuTruncatedSVD(n_components=n_comp, algorithm="jacobi", output_type="numpy")
+        svd.fit(self.A)
+        
+        return svd
+
+    def _scan_svd(self, threshold: float = 0.90, start: int = 16) -> TruncatedSVD:
+        """
+        Fits the variance-scan SVD with as few components as needed: starts at
+        `start` components and doubles until the threshold is reached or all
+        components are used.
+        
+        :param threshold: The cumulative explained variance ratio to reach.
+        :param start: The number of components to try first.
+        :return: The fitted TruncatedSVD model.
+        """
+        max_comp = min(self.A.shape) - 1
+        n_comp = min(start, max_comp)
+        while True:
+            svd = self._run_svd(n_components=n_comp)
+            # explained_variance_ratio_ is relative to the total variance of A,
+            # so the sum shows whether the threshold is within the fitted components
+            if n_comp >= max_comp or svd.explained_variance_ratio_.sum() >= threshold:
+                return svd
+            n_comp = min(2 * n_comp, max_comp)
+
+    @staticmethod
+    def _find_knee(explained_variance_cumsum: np.ndarray, threshold: float = 0.90) -> int:
+        """
+        Finds the number of components needed to reach the threshold, so the plot
+        and the reduction share one scan.
+        
+        :param explained_variance_cumsum: The cumulative explained variance ratio per component.
+        :param threshold: The cumulative explained variance ratio to reach.
+        :return: k, or all components if the threshold is never reached.
+        """
+        # The cumsum is non-decreasing, so a binary search finds the first index >= threshold
+        k = int(np.searchsorted(explained_variance_cumsum, threshold)) + 1
+        return min(k, len(explained_variance_cumsum))
+
+    def _generate_plot(self, explained_variance_cumsum: np.ndarray, k_90: int) -> Path:
         """
         Generates and saves the plot showing cumulative explained variance.
         
-        :param svd_model: The fitted TruncatedSVD model.
+        :param explained_variance_cumsum: The cumulative explained variance ratio per component.
+        :param k_90: The number of components needed to explain 90% of the variance.
         :return: Path to the final saved plot image.
         """
-        explained_variance_cumsum = np.cumsum(svd_model.explained_variance_ratio_)
         num_components = len(explained_variance_cumsum)
         # Construct the specific output path for the plot
         plot_path = self.output_path.with_suffix(".png")
-
-        # Find the number of components needed to explain 90% of the variance
-        k_90 = np.argmax(explained_variance_cumsum >= 0.90) + 1
         
+        # The style categories_graph.py used to leave behind for this plot when all
+        # plots ran in one process; set here now that each plot runs in its own worker
+        plt.style.use('seaborn-v0_8-whitegrid')
         fig, ax = plt.subplots(figsize=(10, 6))
 
         # Plot the cumulative explained variance
@@ -117,8 +198,9 @@ class SVDAnalyzer:
         ax.axhline(y=0.90, color='r', linestyle='--', label='90% Variance Explained')
         ax.axvline(x=k_90, color='r', linestyle='--', alpha=0.6)
         
-        # Annotation for the 90% cutoff point
-        ax.text(k_90 + 1, 0.90, f'  k={k_90}', color='red', va='bottom')
+        # Annotation for the 90% cutoff point, left of the line: the scan stops just
+        # past k_90, so there is no room for it on the right
+        ax.text(k_90, 0.90, f'k={k_90}  ', color='red', ha='right', va='bottom')
 
         # Apply titles and labels
         ax.set_title('SVD: Cumulative Explained Variance', fontsize=16)
@@ -131,79 +213,94 @@ class SVDAnalyzer:
         ax.set_xticks(range(1, max_tick + 1, max(1, max_tick // 10)))
         ax.set_ylim(0, 1.05)
         
-        plt.tight_layout() 
-        
         logger.info(f"Saving SVD explained variance plot to: {plot_path.name}")
-        fig.savefig(plot_path, dpi=300)
+        # A mostly-axes line plot does not need print resolution; bbox_inches="tight"
+        # trims the margins, so no separate tight_layout() pass is needed
+        fig.savefig(plot_path, dpi=120, bbox_inches="tight")
         plt.close(fig) 
         return plot_path
         
-    def _perform_reduction_and_interpret(self, k: int = 15) -> pd.DataFrame:
+    def _perform_reduction_and_interpret(self, svd_model: TruncatedSVD, k: int = 15) -> pd.DataFrame:
         """
         Performs the final SVD reduction with a fixed k and creates the 
         factor interpretation matrix (V_T) and the reduced data matrix (U * Sigma).
         
+        :param svd_model: The fitted variance-scan TruncatedSVD model (at least k components).
         :param k: The number of components to keep.
         :return: The final DataFrame with factor scores appended.
         """
         logger.info(f"--- Finalizing SVD Reduction with selected k={k} ---")
         
-        # 1. Rerun SVD with the selected k
-        svd_model = self._run_svd(n_components=k)
-        
-        # A_reduced: U * Sigma (the row scores for the new latent factors)
-        A_reduced = svd_model.transform(self.A)
-        
+        # 1. Reuse the first k components of the variance-scan fit instead of refitting
         # Vt: The V_transpose matrix (the factor loadings)
-        Vt = svd_model.components_
+        Vt = svd_model.components_[:k]
+        
+        # A_reduced: U * Sigma (the row scores for the new latent factors);
+        # the component rows are orthonormal, so this equals svd.transform(A)
+        A_reduced = self.A @ Vt.T
         
         # 2. Create the Interpretation DataFrame (V_T)
         factor_names = [f'Factor_{i+1}' for i in range(k)]
         
-        # V_T: Features as rows, Factors as columns (easier to read)
+        # V_T: Features as rows, Factors as columns (easier to read). Vt.T is a
+        # single transposed view of the components, wrapped without a copy
         factor_loadings_df = pd.DataFrame(
             Vt.T, 
             index=self.feature_cols,
-            columns=factor_names
+            columns=factor_names,
+            copy=False,
         )
         
         # Save the interpretation matrix for external analysis
         interpret_path = self.output_path.with_name(f"{self.output_path.stem}_loadings.parq")
-        factor_loadings_df.to_parquet(interpret_path)
+        # Keep the index: it holds the feature names
+        factor_loadings_df.to_parquet(interpret_path, engine="pyarrow", compression="zstd")
         logger.info(f"Factor Loadings (V_T) saved to: {interpret_path.name}")
 
         # 3. Create the Reduced Data DataFrame (U * Sigma)
-        factor_scores_df = pd.DataFrame(A_reduced, columns=factor_names, index=self.df.index)
-        
-        # Use only the non-feature columns (metadata)
+        # Use only the non-feature columns (metadata), followed by the new factor
+        # scores, and build the frame in one constructor call instead of copy + concat
         metadata_cols = [col for col in self.df.columns if col not in self.feature_cols]
-        df_reduced = self.df[metadata_cols].copy()
-        
-        # Concatenate the original metadata with the new factor scores
-        df_reduced = pd.concat([df_reduced, factor_scores_df], axis=1)
+        data = {col: self.df[col].array for col in metadata_cols}
+        for i, name in enumerate(factor_names):
+            data[name] = A_reduced[:, i]
+        df_reduced = pd.DataFrame(data, index=self.df.index, copy=False)
 
         # Save the final reduced data
         reduced_path = self.output_path.with_name(f"{self.output_path.stem}_reduced.parq")
-        df_reduced.to_parquet(reduced_path)
+        # Factor scores stay float32 on disk
+        df_reduced.to_parquet(reduced_path, engine="pyarrow", index=False, compression="zstd")
         logger.info(f"Reduced data (U*Sigma) saved to: {reduced_path.name}")
 
         return df_reduced
         
-    def run(self, raw_config_dict: dict) -> Path:
+    def run(self, raw_config_dict: dict, invalidate_cache: bool = False) -> Path:
         """
         Runs the full SVD analysis pipeline.
         
+        The plot is only re-rendered when the input file, config.toml or this module
+        changed since it was last saved. The explained-variance curve is saved next to
+        the plot; while the input file, config.toml and the SVD_STEPS methods are
+        unchanged, a re-render (e.g. after the image was deleted or _generate_plot was
+        edited) only re-draws the plot from it and skips loading the data and the SVD
+        (the loadings and reduced data from the run that saved it stay valid), unless
+        invalidate_cache is set.
+        
         :param raw_config_dict: The raw TOML configuration dictionary.
+        :param invalidate_cache: Recompute the SVD even if the saved curve is valid.
         :return: Path to the final saved plot image.
         """
         # --- File Discovery (Input) ---
-        input_files = list(self.folders.feature_added.glob("*-features.csv"))
+        # Prefer the Parquet output; CSV is only written when 'write_csv' is enabled
+        input_path = (
+            find_latest_file(self.folders.feature_added, "*-features.parq")
+            or find_latest_file(self.folders.feature_added, "*-features.csv")
+        )
         
-        if not input_files:
-            logger.error(f"No *-features.csv files found in {self.folders.feature_added}. Aborting.")
-            raise FileNotFoundError(f"No feature-engineered CSV files found in {self.folders.feature_added}")
-            
-        input_path = max(input_files, key=os.path.getmtime)
+        if input_path is None:
+            logger.error(f"No *-features.parq or *-features.csv files found in {self.folders.feature_added}. Aborting.")
+            raise FileNotFoundError(f"No feature-engineered files found in {self.folders.feature_added}")
+
         
         # --- Output Path Construction ---
         # The base path for all outputs (plot, loadings, reduced data)
@@ -213,6 +310,25 @@ class SVDAnalyzer:
 
         logger.info(f"Selected latest file for SVD: {input_path.name}")
         
+        # --- Skip everything when the saved plot is up to date ---
+        cache_key = plot_cache_key(input_path, Path(__file__), Path("config.toml"))
+        if not invalidate_cache and is_plot_cached(self.output_path, cache_key):
+            logger.info(f"Plot {self.output_path.name} is up to date with {input_path.name}. Skipping rendering.")
+            return self.output_path
+        
+        # --- Reuse the saved explained-variance curve when the SVD inputs are unchanged ---
+        curve_path = self.output_path.with_suffix(".evr.npy")
+        # Covers the source of the SVD steps, so any change to the scaling, feature
+        # selection or solver forces a real refit instead of a re-draw of the old curve
+        svd_source = "".join(inspect.getsource(getattr(SVDAnalyzer, step)) for step in self.SVD_STEPS)
+        svd_key = plot_cache_key(input_path, Path("config.toml"), extra=f"{svd_source}|gpu_min_bytes={GPU_MIN_BYTES}")
+        if not invalidate_cache and is_plot_cached(curve_path, svd_key):
+            logger.info(f"SVD of {input_path.name} is up to date. Re-drawing the plot from {curve_path.name}.")
+            explained_variance_cumsum = np.load(curve_path)
+            plot_path = self._generate_plot(explained_variance_cumsum, self._find_knee(explained_variance_cumsum))
+            mark_plot_cached(plot_path, cache_key)
+            return plot_path
+        
         # 1. Load Data and Standardize
         self._load_data(input_path, raw_config_dict)
         
@@ -221,19 +337,24 @@ class SVDAnalyzer:
 
         logger.info("Starting SVD analysis and visualization...")
         
-        # 2. Perform initial SVD for variance analysis
-        n_comp_full = min(self.A.shape) - 1
-        svd_full = self._run_svd(n_components=n_comp_full)
-        
-        # 3. Generate the plot and save the figure
-        plot_path = self._generate_plot(svd_full)
+        # 2. Perform initial SVD for variance analysis, growing the number of
+        # components only until the 90% knee is covered
+        svd_full = self._scan_svd(threshold=0.90)
         
-        # 4. Determine k (90% threshold)
+        # 3. Determine k (90% threshold) once for both the plot and the reduction
         explained_variance_cumsum = np.cumsum(svd_full.explained_variance_ratio_)
-        k_optimal = np.argmax(explained_variance_cumsum >= 0.90) + 1
+        k_optimal = self._find_knee(explained_variance_cumsum, threshold=0.90)
+        
+        # 4. Generate the plot and save the figure
+        plot_path = self._generate_plot(explained_variance_cumsum, k_optimal)
         
         # 5. Perform final reduction and save the results
-        self._perform_reduction_and_interpret(k=k_optimal)
+        self._perform_reduction_and_interpret(svd_full, k=k_optimal)
+        
+        # 6. Save the curve for later re-draws, marked only once all outputs are written
+        np.save(curve_path, explained_variance_cumsum)
+        mark_plot_cached(curve_path, svd_key)
+        mark_plot_cached(plot_path, cache_key)
         
         logger.info("SVD analysis complete: Plot generated and data/loadings saved.")
         return plot_path
@@ -242,8 +363,7 @@ class SVDAnalyzer:
 # --- Configuration Loading and Public Function (NO CHANGE) ---
 def _load_config_and_raw() -> tuple[CleanConfig, dict]:
     """Loads configuration from config.toml and returns CleanConfig object and the raw dict."""
-    with open("config.toml", "rb") as f:
-        config = tomllib.load(f)
+    config = load_toml_config()
 
     raw = Path(config["raw"])
     preprocessed = Path(config["preprocessed"])
@@ -2,21 +2,22 @@
 
 # import packages
 import sys
-import tomllib
 from pathlib import Path
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import matplotlib
+matplotlib.use("Agg") # Plots are only saved to file, never shown
 import matplotlib.pyplot as plt
-import seaborn as sns
+from scipy import stats
 from loguru import logger
-import os
 
 # Assuming correct path for settings is now:
-from data_handling.settings import Folders, CleanConfig 
+from data_handling.settings import Folders, CleanConfig, find_latest_file, load_toml_config, read_parquet, read_csv, plot_cache_key, is_plot_cached, mark_plot_cached 
 
 # --- LOGGING SETUP (Copied from time_series.py) ---
 logger.remove()
-logger.add("logs/logfile.log", rotation="1 week", level="DEBUG")
+logger.add("logs/logfile.log", rotation="1 week", level="DEBUG", enqueue=True, backtrace=False, diagnose=False)
 logger.add(sys.stderr, level="INFO")
 
 
@@ -25,6 +26,10 @@ class DistributionAnalyzer:
     A class to handle distribution analysis and visualization based on 
     the feature-engineered DataFrame.
     """
+    # Only these columns are loaded from the feature file, with their CSV types
+    CSV_TYPES = {'living_in_city': pa.int8(), 'react_time_sec': pa.float32()}
+    REQUIRED_COLS = list(CSV_TYPES)
+    
     def __init__(self, config: CleanConfig, output_filename: str):
         """
         Initializes the analyzer, using config for folder paths.
@@ -37,6 +42,27 @@ class DistributionAnalyzer:
         self.df = None
         # self.output_path will be constructed in the run method
         
+    def _compute_kde_curves(self, samples: list[np.ndarray], grid_size: int = 512) -> tuple[np.ndarray, list[np.ndarray]]:
+        """
+        Estimates the probability density of each sample with a Gaussian KDE
+        (Scott's bandwidth) evaluated on one shared grid. Like seaborn's kdeplot,
+        the grid extends three bandwidths beyond the observed values.
+        
+        :param samples: The samples to estimate, NaNs are ignored.
+        :param grid_size: The number of grid points.
+        :return: A tuple containing (grid, list of densities on the grid).
+        """
+        values = [sample[~np.isnan(sample)] for sample in samples]
+        kdes = [stats.gaussian_kde(v, bw_method="scott") for v in values]
+        
+        # Bandwidth in data units is the square root of the 1x1 kernel covariance
+        cut = [3 * np.sqrt(kde.covariance[0, 0]) for kde in kdes]
+        low = min(v.min() - c for v, c in zip(values, cut))
+        high = max(v.max() + c for v, c in zip(values, cut))
+        
+        grid = np.linspace(low, high, grid_size)
+        return grid, [kde(grid) for kde in kdes]
+
     def _generate_plot(self, df: pd.DataFrame) -> plt.Figure:
         """
         Generates the KDE plot comparing 'react_time_min' distribution 
@@ -47,25 +73,28 @@ class DistributionAnalyzer:
         """
         logger.info("    -> Generating KDE distribution plot.")
         
-        # NOTE: The plotting logic requires a 'react_time_min_log' column, 
-        # but the required_cols check only asks for 'react_time_min'.
-        # We assume 'react_time_min_log' is either created during feature engineering
-        # or we create it here if it's based directly on 'react_time_min'.
-        if 'react_time_min_log' not in df.columns:
-            # Safely create the log column before splitting (adding a small epsilon to avoid log(0))
-            df['react_time_min_log'] = np.log(df['react_time_min'] + 1e-6)
-            logger.warning("    -> 'react_time_min_log' was not found, generating log transformation now.")
+        # The feature file only stores 'react_time_sec'; derive log(1 + minutes)
+        # for the skewed distribution as a plain array, leaving the DataFrame untouched
+        react_time_min_log = np.log1p(df['react_time_sec'].to_numpy(dtype=np.float64) / 60)
 
-        # Split data based on the binary feature
-        city_dwellers = df[df['living_in_city'] == 1]['react_time_min_log']
-        non_city_dwellers = df[df['living_in_city'] == 0]['react_time_min_log']
+        # Split data based on the binary feature with one mask
+        in_city = df['living_in_city'].to_numpy() == 1
+        city_dwellers = react_time_min_log[in_city]
+        non_city_dwellers = react_time_min_log[~in_city]
 
+        # The style categories_graph.py used to leave behind for this plot when all
+        # plots ran in one process; set here now that each plot runs in its own worker
+        plt.style.use('seaborn-v0_8-whitegrid')
         # Create the figure
         fig, ax = plt.subplots(figsize=(10, 6))
 
-        # Use seaborn for KDE to get the smooth distribution curves
-        sns.kdeplot(non_city_dwellers, color='limegreen', fill=True, alpha=0.5, label='Living in hometown', ax=ax)
-        sns.kdeplot(city_dwellers, color='darkorange', fill=True, alpha=0.5, label='Away from hometown', ax=ax)
+        # Evaluate both smooth distribution curves once on a shared grid
+        grid, densities = self._compute_kde_curves([non_city_dwellers, city_dwellers])
+        curves = zip(densities, ['limegreen', 'darkorange'], ['Living in hometown', 'Away from hometown'])
+        for density, color, label in curves:
+            ax.fill_between(grid, density, color=color, alpha=0.5, label=label)
+            ax.plot(grid, density, color=color, linewidth=1.0)
+        ax.set_ylim(bottom=0)
 
         # Apply titles and labels
         fig.suptitle('Response Time: How Location Matters', fontsize=18, y=1.0)
@@ -82,21 +111,28 @@ class DistributionAnalyzer:
         
         return fig
 
-    def run(self) -> Path:
+    def run(self, invalidate_cache: bool = False) -> Path:
         """
         Runs the distribution analysis pipeline: loads latest data, generates plot, 
         and saves the final image.
         
+        The plot is only re-rendered when the input file or this module changed
+        since it was last saved, unless invalidate_cache is set.
+        
+        :param invalidate_cache: Re-render the plot even if a cached image is valid.
         :return: Path to the final saved plot image.
         """
         # --- File Discovery (Input) ---
-        input_files = list(self.folders.feature_added.glob("*-features.csv"))
+        # Prefer the Parquet output; CSV is only written when 'write_csv' is enabled
+        input_path = (
+            find_latest_file(self.folders.feature_added, "*-features.parq")
+            or find_latest_file(self.folders.feature_added, "*-features.csv")
+        )
         
-        if not input_files:
-            logger.error(f"No *-features.csv files found in {self.folders.feature_added}. Exiting.")
-            raise FileNotFoundError(f"No feature-engineered CSV files found in {self.folders.feature_added}")
-            
-        input_path = max(input_files, key=os.path.getmtime)
+        if input_path is None:
+            logger.error(f"No *-features.parq or *-features.csv files found in {self.folders.feature_added}. Exiting.")
+            raise FileNotFoundError(f"No feature-engineered files found in {self.folders.feature_added}")
+
         logger.info(f"Selected latest file for analysis: {input_path.name}")
         
         # --- Output Path Construction ---
@@ -104,36 +140,40 @@ class DistributionAnalyzer:
         plot_output_dir.mkdir(parents=True, exist_ok=True)
         self.output_path = plot_output_dir / self.output_filename
 
+        # --- Skip the KDE fits and rendering when the saved plot is up to date ---
+        cache_key = plot_cache_key(input_path, Path(__file__))
+        if not invalidate_cache and is_plot_cached(self.output_path, cache_key):
+            logger.info(f"Plot {self.output_path.name} is up to date with {input_path.name}. Skipping rendering.")
+            return self.output_path
+
         logger.info(f"Loading data for distribution analysis from: {input_path.name}")
         
         try:
             # Attempt to load Parquet first, then fallback to CSV
-            parquet_path = input_path.with_suffix(".parq")
-            if parquet_path.exists():
-                self.df = pd.read_parquet(parquet_path)
+            if input_path.suffix == ".parq":
+                self.df = read_parquet(input_path, columns=self.REQUIRED_COLS)
             else:
-                # Assuming 'timestamp' is not needed for this plot, but keeping 
-                # parse_dates just in case, or removing if it fails/is unnecessary.
-                self.df = pd.read_csv(input_path) 
+                # 'timestamp' is not needed for this plot, so only the used columns are parsed
+                self.df = read_csv(input_path, column_types=self.CSV_TYPES, include_columns=self.REQUIRED_COLS)
                 
         except Exception as e:
             logger.error(f"Failed to load data from {input_path}: {e}")
             raise
         
         # Check if the necessary columns are present
-        required_cols = ['living_in_city', 'react_time_min']
-        if not all(col in self.df.columns for col in required_cols):
-            logger.error(f"Missing required columns for plotting: {required_cols}")
-            raise ValueError(f"Data is missing required columns: {required_cols}")
+        if not all(col in self.df.columns for col in self.REQUIRED_COLS):
+            logger.error(f"Missing required columns for plotting: {self.REQUIRED_COLS}")
+            raise ValueError(f"Data is missing required columns: {self.REQUIRED_COLS}")
             
         logger.info("Starting distribution analysis and visualization...")
         
         # Generate the plot
-        fig = self._generate_plot(self.df.copy()) # Use a copy for safe log transformation
+        fig = self._generate_plot(self.df)
         
         # Save the figure
         logger.info(f"Saving distribution plot to: {self.output_path.name}")
-        fig.savefig(self.output_path, dpi=300)
+        fig.savefig(self.output_path, dpi=150)
+        mark_plot_cached(self.output_path, cache_key)
         
         logger.info("Distribution analysis complete.")
         plt.close(fig) 
@@ -143,8 +183,7 @@ class DistributionAnalyzer:
 # --- Configuration Loading and Public Function (Copied from time_series.py) ---
 def _load_config() -> CleanConfig:
     """Loads configuration from config.toml and returns a CleanConfig object."""
-    with open("config.toml", "rb") as f:
-        config = tomllib.load(f)
+    config = load_toml_config()
 
     raw = Path(config["raw"])
     preprocessed = Path(config["preprocessed"])
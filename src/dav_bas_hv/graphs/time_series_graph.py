@@ -2,30 +2,51 @@
 
 # import packages
 import sys
-import tomllib
 from pathlib import Path
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import matplotlib
+matplotlib.use("Agg") # Plots are only saved to file, never shown
 import matplotlib.pyplot as plt
 from loguru import logger
-import os
 
 # Assuming correct path for settings is now:
-from data_handling.settings import Folders, CleanConfig 
+from data_handling.settings import Folders, CleanConfig, find_latest_file, load_toml_config, read_parquet, read_csv, plot_cache_key, is_plot_cached, mark_plot_cached 
 
 logger.remove()
-logger.add("logs/logfile.log", rotation="1 week", level="DEBUG")
+logger.add("logs/logfile.log", rotation="1 week", level="DEBUG", enqueue=True, backtrace=False, diagnose=False)
 logger.add(sys.stderr, level="INFO")
 
+# Parquet feature files at least this large are aggregated batch by batch instead of
+# being loaded whole, so memory stays bounded by the batch size and the number of months
+STREAM_MIN_BYTES = 1024 * 1024 * 1024
+
 
 class DualAxisTrendsAnalyzer:
     """
     A class to handle the analysis and visualization of monthly message volume
     and average word count over time using a dual-axis plot.
     """
+    # Only these columns are loaded from the feature file, with their CSV types
+    CSV_TYPES = {
+        'timestamp': pa.timestamp('ns', tz='UTC'),
+        'word_count': pa.uint16(),
+        'date_living_with_partner': pa.timestamp('ns', tz='UTC'),
+    }
+    REQUIRED_COLS = list(CSV_TYPES)
+    # Resolution of the saved image unless another dpi is passed
+    DEFAULT_DPI = 150
     
-    def __init__(self, config: CleanConfig, output_filename: str):
+    def __init__(self, config: CleanConfig, output_filename: str, dpi: int = DEFAULT_DPI):
+        """
+        :param config: The loaded application configuration object.
+        :param output_filename: The name of the final plot image file.
+        :param dpi: Resolution of the saved image; raise it for print-quality output.
+        """
         self.folders = config.folders
         self.output_filename = output_filename
+        self.dpi = dpi
         self.df = None
         self.trends_df = None
         
@@ -41,34 +62,70 @@ class DualAxisTrendsAnalyzer:
         """
         logger.info("    -> Resampling data to monthly frequency and calculating trends.")
         
-        # 1. Ensure the timestamp column is the index
-        # We assume 'timestamp' is already datetime from the loading step in run()
-        df = df.set_index('timestamp')
+        # 1-2. Calculate Monthly Trends in a single resample pass over the 'timestamp'
+        # column (already datetime from the loading step in run()); month-end bins,
+        # empty months included with a count of 0 (so no row is ever all-NaN)
+        trends_df = (
+            df.resample('ME', on='timestamp')['word_count']
+            .agg(message_count='size', avg_word_count='mean')
+        )
+        return self._add_trend_lines(trends_df)
 
-        # 2. Calculate Monthly Trends
-        monthly_message_count = df.resample('M').size().rename('message_count')
-        monthly_avg_word_count = df['word_count'].resample('M').mean().rename('avg_word_count')
+    def _prepare_data_chunked(self, input_path: Path, batch_size: int = 1_000_000) -> tuple[pd.DataFrame, pd.Series]:
+        """
+        Same monthly trends as _prepare_data, but streamed from a Parquet feature file
+        one record batch at a time, for files that do not fit in memory.
+        
+        :param input_path: Path to the feature-engineered Parquet file.
+        :param batch_size: The maximum number of rows per batch.
+        :return: A tuple containing (monthly trends and trend lines, unique partnership dates).
+        """
+        logger.info("    -> Streaming monthly counts and word count sums batch by batch.")
+        
+        partials = []
+        dates = []
+        parquet_file = pq.ParquetFile(input_path)
+        for batch in parquet_file.iter_batches(batch_size=batch_size, columns=self.REQUIRED_COLS):
+            chunk = batch.to_pandas()
+            partials.append(
+                chunk.resample('ME', on='timestamp')['word_count'].agg(message_count='size', word_count_sum='sum')
+            )
+            dates.append(pd.Series(chunk['date_living_with_partner'].dropna().unique()))
+        
+        # Counts and sums are additive, so merging the per-batch partials is exact;
+        # resampling the merged partials also restores months without messages (count 0)
+        totals = pd.concat(partials).groupby(level=0).sum().resample('ME').sum()
+        trends_df = pd.DataFrame({
+            'message_count': totals['message_count'],
+            'avg_word_count': totals['word_count_sum'] / totals['message_count'],
+        })
+        return self._add_trend_lines(trends_df), pd.concat(dates, ignore_index=True)
 
-        # Combine the two series into one DataFrame
-        trends_df = pd.concat([monthly_message_count, monthly_avg_word_count], axis=1).dropna(how='all')
+    def _add_trend_lines(self, trends_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Narrows the monthly aggregates and adds their 3-month rolling mean trend lines.
+        
+        :param trends_df: Monthly 'message_count' and 'avg_word_count'.
+        :return: The same DataFrame with 'volume_trend' and 'word_count_trend' added.
+        """
+        # Counts are small integers and the means need no double precision
+        trends_df = trends_df.astype({'message_count': 'int32', 'avg_word_count': 'float32'})
 
         # 3. Calculate Trend Lines (3-month Rolling Mean - kept 6 for smoother trend)
         window = 3
-        trends_df['volume_trend'] = trends_df['message_count'].rolling(
+        # Both trend lines come from one rolling window over the two columns
+        trends_df[['volume_trend', 'word_count_trend']] = trends_df[['message_count', 'avg_word_count']].rolling(
             window=window, center=True
-        ).mean()
-        trends_df['word_count_trend'] = trends_df['avg_word_count'].rolling(
-            window=window, center=True
-        ).mean()
+        ).mean().to_numpy()
         
         return trends_df
         
-    def _generate_plot(self, trends_df: pd.DataFrame, partnership_dates: pd.Series) -> plt.Figure:
+    def _generate_plot(self, trends_df: pd.DataFrame, unique_dates: pd.DatetimeIndex) -> plt.Figure:
         """
         Generates the dual-axis line plot with custom colors, line styles, and axis ranges.
         
         :param trends_df: The DataFrame containing the monthly trend data.
-        :param partnership_dates: Series of unique partnership start dates.
+        :param unique_dates: The unique, non-NaT partnership start dates.
         :return: The Matplotlib Figure object.
         """
         logger.info("    -> Generating dual-axis plot.")
@@ -110,27 +167,23 @@ class DualAxisTrendsAnalyzer:
         ax2.set_ylim(0, 15)
 
         # --- NEW CHANGE 3: Add Vertical Lines for Partnership Dates ---
-        # Get unique, non-NaT dates for partnership
-        unique_dates = partnership_dates.dropna().unique()
-
         event_label = 'Moving Partner Event'
         
         if len(unique_dates) > 0:
             logger.info(f"    -> Adding {len(unique_dates)} vertical lines for partnership start dates.")
             
-            # Use ax1 to plot the vertical lines (they span both axes)
-            for i, date in enumerate(unique_dates):
-                # Ensure the date is a timestamp object for plotting
-                date_dt = pd.to_datetime(date)
-                
-                # Add a vertical dashed line
-                ax1.axvline(
-                    x=date_dt, 
-                    color='red', 
-                    linestyle=':', 
-                    linewidth=1.0, 
-                    label=f'Moving in with girlfriend' if i == 0 else "" # Only label the first one for the legend
-                )
+            # Use ax1 to plot the vertical lines (they span both axes): one dashed
+            # LineCollection from the bottom to the top of the axes, with one legend label
+            ax1.vlines(
+                unique_dates, 
+                0, 
+                1, 
+                transform=ax1.get_xaxis_transform(), 
+                colors='red', 
+                linestyles=':', 
+                linewidths=1.0, 
+                label='Moving in with girlfriend'
+            )
 
         # Title and Layout
         plt.title(
@@ -160,21 +213,28 @@ class DualAxisTrendsAnalyzer:
         
         return fig
 
-    def run(self) -> Path:
+    def run(self, invalidate_cache: bool = False) -> Path:
         """
         Runs the plotting pipeline: loads latest data, performs preparation, 
         generates plot, and saves the final image.
         
+        The plot is only re-rendered when the input file, this module or the dpi
+        changed since it was last saved, unless invalidate_cache is set.
+        
+        :param invalidate_cache: Re-render the plot even if a cached image is valid.
         :return: Path to the final saved plot image.
         """
         # --- File Discovery (Input) ---
-        input_files = list(self.folders.feature_added.glob("*-features.csv"))
+        # Prefer the Parquet output; CSV is only written when 'write_csv' is enabled
+        input_path = (
+            find_latest_file(self.folders.feature_added, "*-features.parq")
+            or find_latest_file(self.folders.feature_added, "*-features.csv")
+        )
         
-        if not input_files:
-            logger.error(f"No *-features.csv files found in {self.folders.feature_added}. Exiting.")
-            raise FileNotFoundError(f"No feature-engineered CSV files found in {self.folders.feature_added}")
-            
-        input_path = max(input_files, key=os.path.getmtime)
+        if input_path is None:
+            logger.error(f"No *-features.parq or *-features.csv files found in {self.folders.feature_added}. Exiting.")
+            raise FileNotFoundError(f"No feature-engineered files found in {self.folders.feature_added}")
+
         logger.info(f"Selected latest file for analysis: {input_path.name}")
         
         # --- Output Path Construction ---
@@ -182,35 +242,88 @@ class DualAxisTrendsAnalyzer:
         plot_output_dir.mkdir(parents=True, exist_ok=True)
         self.output_path = plot_output_dir / self.output_filename
 
-        logger.info(f"Loading data for trends analysis from: {input_path.name}")
-        
-        try:
-            # Load with parse_dates for necessary columns
-            self.df = pd.read_csv(input_path, parse_dates=['timestamp', 'date_living_with_partner'])
-        except Exception as e:
-            logger.error(f"Failed to load data from {input_path}: {e}")
-            raise
-        
-        # Check if the necessary column is present
-        required_cols = ['timestamp', 'word_count', 'date_living_with_partner']
-        if not all(col in self.df.columns for col in required_cols):
-            logger.error(f"Missing required columns for plotting: {required_cols}")
-            raise ValueError(f"Data is missing required columns: {required_cols}")
+        # --- Skip loading and resampling when the saved plot is up to date ---
+        # A non-default dpi is part of the key, so an image saved at another resolution
+        # is never reused; the default keeps the key main.py computes for this plot
+        cache_key = plot_cache_key(
+            input_path,
+            Path(__file__),
+            extra=None if self.dpi == self.DEFAULT_DPI else f"dpi={self.dpi}",
+        )
+        if not invalidate_cache and is_plot_cached(self.output_path, cache_key):
+            logger.info(f"Plot {self.output_path.name} is up to date with {input_path.name}. Skipping rendering.")
+            return self.output_path
+
+        # --- Reuse the saved monthly trends when only the image is out of date ---
+        # (e.g. rendered at another dpi, or deleted). They are the output of
+        # _prepare_data and _add_trend_lines, so they are keyed on the input file and
+        # this module; when valid only the partnership dates are loaded.
+        trends_path = self.output_path.with_suffix(".trends.parq")
+        trends_key = plot_cache_key(input_path, Path(__file__))
+        reuse_trends = not invalidate_cache and is_plot_cached(trends_path, trends_key)
+        columns = ['date_living_with_partner'] if reuse_trends else self.REQUIRED_COLS
+        # Large Parquet inputs are aggregated batch by batch instead of being loaded whole
+        stream = (
+            not reuse_trends
+            and input_path.suffix == ".parq"
+            and input_path.stat().st_size >= STREAM_MIN_BYTES
+        )
+
+        if stream:
+            # 1-2. Aggregate the months and collect the partnership dates batch by batch
+            logger.info(f"Streaming data for trends analysis from: {input_path.name}")
+            try:
+                self.trends_df, partnership_dates = self._prepare_data_chunked(input_path)
+            except Exception as e:
+                logger.error(f"Failed to aggregate data from {input_path}: {e}")
+                raise
+            self.trends_df.to_parquet(trends_path, engine="pyarrow", compression="zstd")
+            mark_plot_cached(trends_path, trends_key)
+        else:
+            logger.info(f"Loading data for trends analysis from: {input_path.name}")
             
-        logger.info("Starting dual-axis trends analysis and visualization...")
-        
-        # 1. Prepare the data
-        self.trends_df = self._prepare_data(self.df.copy())
+            try:
+                if input_path.suffix == ".parq":
+                    self.df = read_parquet(input_path, columns=columns)
+                else:
+                    # Parse only the used columns, with the dates converted while parsing
+                    self.df = read_csv(input_path, column_types=self.CSV_TYPES, include_columns=columns)
+            except Exception as e:
+                logger.error(f"Failed to load data from {input_path}: {e}")
+                raise
+            
+            # Check if the necessary column is present
+            if not all(col in self.df.columns for col in columns):
+                logger.error(f"Missing required columns for plotting: {columns}")
+                raise ValueError(f"Data is missing required columns: {columns}")
+                
+            logger.info("Starting dual-axis trends analysis and visualization...")
+            
+            # 1. Prepare the data (or load the saved monthly trends)
+            if reuse_trends:
+                logger.info(f"Monthly trends are up to date with {input_path.name}. Loading {trends_path.name}.")
+                self.trends_df = read_parquet(trends_path)
+            else:
+                self.trends_df = self._prepare_data(self.df)
+                self.trends_df.to_parquet(trends_path, engine="pyarrow", compression="zstd")
+                mark_plot_cached(trends_path, trends_key)
+            
+            # 2. Get the partnership dates, then release the loaded frame before plotting
+            partnership_dates = self.df['date_living_with_partner']
+            self.df = None
         
-        # 2. Get unique partnership dates for vertical lines
-        partnership_dates = self.df['date_living_with_partner']
+        # Unique, non-NaT dates for the vertical lines, converted once to a DatetimeIndex
+        # so every element is already a Timestamp for plotting
+        unique_dates = pd.DatetimeIndex(partnership_dates.dropna().unique())
+        del partnership_dates
         
         # 3. Generate the plot
-        fig = self._generate_plot(self.trends_df, partnership_dates)
+        fig = self._generate_plot(self.trends_df, unique_dates)
         
         # 4. Save the figure
         logger.info(f"Saving dual-axis trends plot to: {self.output_path.name}")
-        fig.savefig(self.output_path, dpi=300)
+        fig.savefig(self.output_path, dpi=self.dpi)
+        mark_plot_cached(self.output_path, cache_key)
         
         logger.info("Dual-axis trends analysis complete.")
         plt.close(fig) 
@@ -220,8 +333,7 @@ class DualAxisTrendsAnalyzer:
 # --- Configuration Loading and Public Function (NO CHANGE) ---
 def _load_config() -> CleanConfig:
 # ... (function body remains the same) ...
-    with open("config.toml", "rb") as f:
-        config = tomllib.load(f)
+    config = load_toml_config()
 
     raw = Path(config["raw"])
     preprocessed = Path(config["preprocessed"])
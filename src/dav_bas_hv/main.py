@@ -1,28 +1,134 @@
 # Modules
-import tomllib
+import sys
 from pathlib import Path
 import os
+import json
+import multiprocessing
+import importlib
+import importlib.util
+from typing import Optional
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from loguru import logger
 
 # Importing necessary functions from other modules
-from data_handling.preprocess import run_preprocess as preprocess_main 
-from data_handling.clean_data import run_cleaning as clean_data_main
-from data_handling.add_features import run_feature_engineering as feature_engineering_main
-
-# Importing analysis functions
-from graphs.time_series_graph import run_dual_axis_analysis as time_series_main
-from graphs.categories_graph import run_categories_analysis as categories_analysis_main
-from graphs.distribution_graph import run_distribution_analysis as distribution_analysis_main
-from graphs.correlation_graph import run_correlation_analysis as correlation_analysis_main
-from graphs.dimensionality_graph import run_svd_analysis as svd_analysis_main
+from data_handling.settings import load_toml_config, find_latest_file, file_digest, plot_cache_key, is_plot_cached
+
+# Configure Loguru (same sinks as the step modules)
+logger.remove()
+logger.add("logs/logfile.log", rotation="1 week", level="DEBUG", enqueue=True, backtrace=False, diagnose=False)
+logger.add(sys.stderr, level="INFO")
+
+# The data handling and analysis functions are imported inside main() only when
+# their step has to run, so runs that skip them do not pay for importing pandas,
+# matplotlib, seaborn or scikit-learn.
+# Data steps, run in order as each one reads the output of the previous one.
+# Each entry: (file label, step name, config key of the output filename, output folder,
+# input folder, input file patterns in order of preference ({...} filled from the
+# config), module, entry point, keyword arguments)
+DATA_STAGES = [
+    ("Preprocessed", "preprocessing", "preprocess_csv", "data/preprocessed",
+     "data/raw", ("{input}",),
+     "data_handling.preprocess", "run_preprocess", {"device": "android"}),
+    ("Cleaned", "cleaning", "cleaned_csv", "data/cleaned",
+     "data/preprocessed", ("*-preprocess.csv",),
+     "data_handling.clean_data", "run_cleaning", {}),
+    ("Feature engineered", "feature engineering", "feature_engineered_csv", "data/feature_added",
+     "data/cleaned", ("*-cleaned.parq", "*-cleaned.csv"),
+     "data_handling.add_features", "run_feature_engineering", {}),
+]
+
+# Files every data step depends on besides its input and its own module: the
+# shared settings (regexes, readers, config models) and the config values
+# (datetime_format, drop_authors, sentiment_backend, write_csv, ...)
+DATA_STAGE_DEPENDENCIES = ("data_handling.settings", "config.toml")
+
+# The plots read the latest feature engineered file
+FEATURES_FOLDER = "data/feature_added"
+FEATURES_PATTERNS = ("*-features.parq", "*-features.csv")
+
+# Each entry: (label, config key of the plot filename, module, entry point,
+# files besides the input and the module that the plot's cache key covers)
+PLOT_STAGES = [
+    ("Time series", "time_series_plot_png", "graphs.time_series_graph", "run_dual_axis_analysis", ()),
+    ("Categories", "categories_plot_png", "graphs.categories_graph", "run_categories_analysis", ()),
+    ("Distribution", "distribution_plot_png", "graphs.distribution_graph", "run_distribution_analysis", ()),
+    ("Correlation", "correlation_plot_png", "graphs.correlation_graph", "run_correlation_analysis", ()),
+    ("Dimensionality", "dimensionality_plot_png", "graphs.dimensionality_graph", "run_svd_analysis", ("config.toml",)),
+]
+
+def _run_plot_stage(module_name: str, function_name: str, plot_filename: str) -> Path:
+    """
+    Imports one analysis module and makes its plot. Runs inside a worker process.
+
+    :param module_name: The module holding the analysis entry point.
+    :param function_name: The analysis entry point.
+    :param plot_filename: The filename of the plot to save.
+    :return: Path to the saved plot.
+    """
+    analysis_main = getattr(importlib.import_module(module_name), function_name)
+    # Importing the module (and main.py, re-imported by the spawned worker) added
+    # the rotating file sink; only the main process may rotate logs/logfile.log,
+    # so the worker appends to it without rotation
+    logger.remove()
+    logger.add("logs/logfile.log", level="DEBUG", enqueue=True, backtrace=False, diagnose=False)
+    logger.add(sys.stderr, level="INFO")
+    return analysis_main(output_filename=plot_filename)
+
+def _present_files(folder: Path) -> set[str]:
+    """
+    Lists the names of the entries in a folder with a single directory read,
+    so checking which outputs exist takes no stat call per file.
+
+    :param folder: The folder to list.
+    :return: The entry names, or an empty set if the folder does not exist.
+    """
+    try:
+        with os.scandir(folder) as entries:
+            return {entry.name for entry in entries}
+    except FileNotFoundError:
+        return set()
+
+def _latest_input(folder: str, patterns: tuple[str, ...], config: dict) -> Optional[Path]:
+    """
+    Finds the file a step reads: the latest match of the first pattern that matches.
+
+    :param folder: The folder holding the step's input.
+    :param patterns: Glob patterns in order of preference, formatted with the config.
+    :param config: The parsed configuration.
+    :return: Path to the input file, or None if there is none.
+    """
+    for pattern in patterns:
+        path = find_latest_file(Path(folder), pattern.format(**config))
+        if path is not None:
+            return path
+    return None
+
+def _module_file(module_name: str) -> Path:
+    """Returns the source file of a module without importing it."""
+    return Path(importlib.util.find_spec(module_name).origin)
+
+def _manifest_path(folder: Path, module_name: str) -> Path:
+    """Returns the manifest that records the last run of a data step."""
+    return folder / f".{module_name.rsplit('.', 1)[-1]}.manifest.json"
+
+def _read_manifest(manifest_path: Path) -> dict:
+    """
+    Reads a data step's manifest.
+
+    :param manifest_path: Path from _manifest_path.
+    :return: The recorded run, or an empty dict if there is no valid manifest.
+    """
+    try:
+        return json.loads(manifest_path.read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
 
 # Load toml configuration
 def load_config(config_path="config.toml"):
     try:
-        with open(config_path, "rb") as f:
-            config = tomllib.load(f)
-        return config
+        return load_toml_config(config_path)
     except FileNotFoundError:
-        print(f"Configuration file {config_path} not found.")
+        logger.error(f"Configuration file {config_path} not found.")
         return None
 
 def main():
@@ -31,117 +137,93 @@ def main():
     if not config:
         return
     
-    # ---- Set paths with Pathlib ----
-    preprocessed_filename = config["preprocess_csv"]
-    cleaned_filename = config["cleaned_csv"]
-    feature_engineered_filename = config["feature_engineered_csv"]
-    time_series_plot_filename = config["time_series_plot_png"]
-    categories_plot_filename = config["categories_plot_png"]
-    distribution_plot_filename = config["distribution_plot_png"]
-    correlation_plot_filename = config["correlation_plot_png"]
-    dimensionality_plot_filename = config["dimensionality_plot_png"]
-
-    # ---- Folder paths with Pathlib ----
-    data_preprocess_folder_str = Path("data/preprocessed").resolve()
-    data_cleaned_folder_str = Path("data/cleaned").resolve()
-    data_feature_folder_str = Path("data/feature_added").resolve()
-    img_folder_str = Path("img/final").resolve()
-
-    #convert data folder string to a path object
-    data_folder_preprocess = Path(data_preprocess_folder_str)
-    data_folder_cleaned = Path(data_cleaned_folder_str)
-    data_folder_feature = Path(data_feature_folder_str)
-    img_folder = Path(img_folder_str)
-
-    # ---- Full path names ----
-    preprocessed_filepath = data_folder_preprocess / preprocessed_filename
-    cleaned_filepath = data_folder_cleaned / cleaned_filename
-    feature_engineered_filepath = data_folder_feature / feature_engineered_filename
-    time_series_plot_filepath = img_folder / time_series_plot_filename
-    categories_plot_filepath = img_folder / categories_plot_filename
-    distribution_plot_filepath = img_folder / distribution_plot_filename
-    correlation_plot_filepath = img_folder / correlation_plot_filename
-    dimensionality_plot_filepath = img_folder / dimensionality_plot_filename
-
-    # ---- Preprocessing (Creates preprocess csv) ----
-    
-    if preprocessed_filepath.exists():
-        print(f"Preprocessed file '{preprocessed_filename} already exists at '{preprocessed_filepath}'. Skipping preprocessing.")
-    else:
-        print(f"Preprocessed file '{preprocessed_filename}' not found. Running preprocessing...")
-        output_filepath = preprocess_main(device="android")
-        print("Preprocessing completed.")
-    
-    # ---- Cleaning (Creates cleaned csv) ----
-
-    if cleaned_filepath.exists():
-        print(f"Cleaned file '{cleaned_filename}' already exists at '{cleaned_filepath}'. Skipping cleaning.")
-    else:
-        print(f"Cleaned file '{cleaned_filename}' not found. Running cleaning...")
-        cleaned_data_path = clean_data_main()
-        print("Cleaning completed. Cleaned data saved to: {cleaned_data_path}")
-
-    # ----- Add Features -----
-
-    if feature_engineered_filepath.exists():
-        print(f"Feature engineered file '{feature_engineered_filename}' already exists at '{feature_engineered_filepath}'. Skipping feature engineering.")
-    else:
-        print(f"Feature engineered file '{feature_engineered_filename}' not found. Running feature engineering...")
-        feature_engineered_data_path = feature_engineering_main()
-        
-        print(f"Feature engineering completed. Final data saved to: {feature_engineered_data_path}")
-
-    # ----- Time Series Analysis -----
-
-    if time_series_plot_filepath.exists():
-        print(f"Time series plot '{time_series_plot_filename}' already exists at '{time_series_plot_filepath}'. Skipping making graph.")
-    else:
-        print(f"Time series plot '{time_series_plot_filename}' not found. Running time series analysis...")
-        time_series_plot_path = time_series_main(
-            output_filename=time_series_plot_filename
-        )
-        print(f"Time series analysis completed. Plot saved to: {time_series_plot_path}")
-
-    # ----- Categories Analysis -----
-    if categories_plot_filepath.exists():
-        print(f"Categories plot '{categories_plot_filename}' already exists at '{categories_plot_filepath}'. Skipping making graph.")
-    else:
-        print(f"Categories plot '{categories_plot_filename}' not found. Running categories analysis...")
-        categories_plot_path = categories_analysis_main(
-            output_filename=categories_plot_filename
-        )
-        print(f"Categories analysis completed. Plot saved to: {categories_plot_path}")
-
-    # ----- Distribution Analysis -----
-
-    if distribution_plot_filepath.exists():
-        print(f"Distribution plot '{distribution_plot_filename}' already exists at '{distribution_plot_filepath}'. Skipping making graph.")
-    else:
-        print(f"Distribution plot '{distribution_plot_filename}' not found. Running distribution analysis...")
-        distribution_plot_path = distribution_analysis_main(
-            output_filename=distribution_plot_filename
-        )
-        print(f"Distribution analysis completed. Plot saved to: {distribution_plot_path}")
-
-    # ----- Correlation Analysis -----
-    if correlation_plot_filepath.exists():
-        print(f"Correlation plot '{correlation_plot_filename}' already exists at '{correlation_plot_filepath}'. Skipping making graph.")
-    else:
-        print(f"Correlation plot '{correlation_plot_filename}' not found. Running correlation analysis...")
-        correlation_plot_path = correlation_analysis_main(
-            output_filename=correlation_plot_filename
-        )
-        print(f"Correlation analysis completed. Plot saved to: {correlation_plot_path}")
-    
-    # ----- Dimensionality Analysis -----
-    if dimensionality_plot_filepath.exists():
-        print(f"Dimensionality plot '{dimensionality_plot_filename}' already exists at '{dimensionality_plot_filepath}'. Skipping making graph.")
-    else:
-        print(f"Dimensionality plot '{dimensionality_plot_filename}' not found. Running dimensionality analysis...")
-        dimensionality_plot_path = svd_analysis_main(
-            output_filename=dimensionality_plot_filename
-        )
-        print(f"Dimensionality analysis completed. Plot saved to: {dimensionality_plot_path}")
+    # ---- Data steps (preprocess, clean, add features) ----
+
+    # A step is skipped when its configured output file exists, or when its manifest
+    # shows it already ran on an input with the same contents, with the same code,
+    # settings and config, and its output is still there
+    dependency_hashes = {
+        dependency: file_digest(Path(dependency) if dependency.endswith(".toml") else _module_file(dependency))
+        for dependency in DATA_STAGE_DEPENDENCIES
+    }
+    for (file_label, step, config_key, folder, input_folder, input_patterns,
+         module_name, function_name, kwargs) in DATA_STAGES:
+        filename = config[config_key]
+        # Relative to the working directory; listing it needs no resolve()
+        data_folder = Path(folder)
+        filepath = data_folder / filename
+        present = _present_files(data_folder)
+        if filename in present:
+            logger.info(f"{file_label} file '{filename}' already exists at '{filepath}'. Skipping {step}.")
+            continue
+
+        manifest_path = _manifest_path(data_folder, module_name)
+        input_path = _latest_input(input_folder, input_patterns, config)
+        fingerprint = None
+        if input_path is not None:
+            # Only contents are compared: a regenerated input with a new timestamped
+            # name but the same bytes still matches (its name is recorded as info only)
+            fingerprint = {
+                "input_hash": file_digest(input_path),
+                "code_hash": file_digest(_module_file(module_name)),
+                "dependency_hashes": dependency_hashes,
+            }
+            manifest = _read_manifest(manifest_path)
+            if manifest.get("output") in present and all(manifest.get(k) == v for k, v in fingerprint.items()):
+                logger.info(f"{file_label} file '{manifest['output']}' is up to date with {input_path.name}. Skipping {step}.")
+                continue
+
+        logger.info(f"{file_label} file '{filename}' not found. Running {step}...")
+        step_main = getattr(importlib.import_module(module_name), function_name)
+        output_path = step_main(**kwargs)
+        if fingerprint is not None:
+            manifest_path.write_text(json.dumps(
+                {"input": input_path.name, **fingerprint, "output": Path(output_path).name}, indent=4
+            ))
+        logger.success(f"{step.capitalize()} completed. Output saved to: {output_path}")
+
+    # ----- Analyses (one plot each) -----
+
+    img_folder = Path("img/final")
+
+    # The plots only depend on the feature engineered data, so the missing ones
+    # are made in parallel, one process each. A saved plot is kept only while its
+    # cache key matches the current input and module (the same key the analysis
+    # module checks itself), so plots of older data are made again.
+    pending = []
+    present_plots = _present_files(img_folder)
+    features_path = _latest_input(FEATURES_FOLDER, FEATURES_PATTERNS, config)
+    for label, config_key, module_name, function_name, key_files in PLOT_STAGES:
+        plot_filename = config[config_key]
+        plot_filepath = img_folder / plot_filename
+        if plot_filename in present_plots:
+            if features_path is None or is_plot_cached(
+                plot_filepath, plot_cache_key(features_path, _module_file(module_name), *map(Path, key_files))
+            ):
+                logger.info(f"{label} plot '{plot_filename}' is up to date at '{plot_filepath}'. Skipping making graph.")
+                continue
+            logger.info(f"{label} plot '{plot_filename}' is out of date. Running {label.lower()} analysis...")
+        else:
+            logger.info(f"{label} plot '{plot_filename}' not found. Running {label.lower()} analysis...")
+        pending.append((label, module_name, function_name, plot_filename))
+
+    if pending:
+        # Spawned workers with max_tasks_per_child=1 give every plot a fresh
+        # interpreter, so global matplotlib state (e.g. plt.style.use) does not
+        # leak between plots
+        max_workers = min(len(pending), os.cpu_count() or 1)
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            max_tasks_per_child=1,
+        ) as executor:
+            futures = {
+                executor.submit(_run_plot_stage, module_name, function_name, plot_filename): label
+                for label, module_name, function_name, plot_filename in pending
+            }
+            for future in as_completed(futures):
+                plot_path = future.result()
+                logger.success(f"{futures[future]} analysis completed. Plot saved to: {plot_path}")
 
 if __name__ == '__main__':
     main()
\ No newline at end of file